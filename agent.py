@@ -0,0 +1,190 @@
+"""
+Remote sensing agent: samples RSSI on this node and pushes it to a beam.py server.
+
+    python agent.py --server http://10.0.0.2:8000 --link kitchen
+    python agent.py --server 10.0.0.2:9999 --transport udp --rate 10
+    python agent.py --server ws://10.0.0.2:8000 --transport ws --source synthetic
+
+Standard library only, except `--transport ws`, which needs `websockets`.
+Samples are batched (`--batch`, seconds) and kept across send failures up to
+`--buffer` samples, oldest dropped first.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import time
+import urllib.request
+from collections import deque
+
+
+class ProcWireless:
+    """Linux: signal level and noise from /proc/net/wireless."""
+
+    def __init__(self, interface=None, path="/proc/net/wireless"):
+        self.interface = interface
+        self.path = path
+
+    def read(self):
+        with open(self.path) as f:
+            lines = f.read().splitlines()[2:]
+        for line in lines:
+            iface, _, rest = line.partition(":")
+            if self.interface and iface.strip() != self.interface:
+                continue
+            fields = rest.split()
+            try:
+                level = int(float(fields[2].rstrip(".")))
+                noise = int(float(fields[3].rstrip(".")))
+            except (IndexError, ValueError):
+                continue
+            if level > 0:
+                level -= 256
+            if noise > 0:
+                noise -= 256
+            return level, (noise if noise > -256 else None)
+        return None, None
+
+
+class Command:
+    """Any command that prints `rssi [noise]` on one line."""
+
+    def __init__(self, command):
+        self.command = command
+
+    def read(self):
+        out = subprocess.run(self.command, shell=True, capture_output=True, text=True, timeout=5).stdout.split()
+        rssi = float(out[0]) if out else None
+        noise = float(out[1]) if len(out) > 1 else None
+        return rssi, noise
+
+
+class Synthetic:
+    """Steady -45 dBm with noise and an occasional 10 s dip, for trying out the pipeline."""
+
+    def __init__(self):
+        self.started = time.time()
+
+    def read(self):
+        dip = -10 if int(time.time() - self.started) % 60 >= 50 else 0
+        return round(-45 + dip + random.gauss(0, 1.5)), -92
+
+
+def make_source(spec):
+    kind, _, arg = spec.partition(":")
+    if kind == "proc":
+        return ProcWireless(arg or None)
+    if kind == "cmd":
+        return Command(arg)
+    if kind == "synthetic":
+        return Synthetic()
+    raise SystemExit(f"unknown source {spec!r} (proc[:iface] | cmd:<command> | synthetic)")
+
+
+class HttpSender:
+    def __init__(self, server):
+        self.url = server.rstrip("/") + "/ingest"
+
+    def send(self, message):
+        body = json.dumps(message).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=5) as resp:
+            json.load(resp)
+
+
+class UdpSender:
+    """Fire-and-forget; a lost datagram only loses that batch."""
+
+    MAX_DATAGRAM = 60000
+
+    def __init__(self, server):
+        host, _, port = server.rpartition(":")
+        self.address = (host, int(port))
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, message):
+        data = json.dumps(message).encode()
+        if len(data) > self.MAX_DATAGRAM:
+            raise ValueError("batch too large for one datagram; lower --batch")
+        self.sock.sendto(data, self.address)
+
+
+class WsSender:
+    """One persistent connection to /ingest/ws, reopened after errors."""
+
+    def __init__(self, server):
+        import websockets
+
+        self.websockets = websockets
+        self.url = server.rstrip("/") + "/ingest/ws"
+        self.loop = asyncio.new_event_loop()
+        self.ws = None
+
+    async def _send(self, message):
+        if self.ws is None:
+            self.ws = await self.websockets.connect(self.url)
+        try:
+            await self.ws.send(json.dumps(message))
+            await self.ws.recv()
+        except Exception:
+            self.ws = None
+            raise
+
+    def send(self, message):
+        self.loop.run_until_complete(self._send(message))
+
+
+SENDERS = {"http": HttpSender, "udp": UdpSender, "ws": WsSender}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--server", required=True, help="http://host:port, ws://host:port, or host:port for udp")
+    parser.add_argument("--link", default=socket.gethostname(), help="link ID shown on the server (default: hostname)")
+    parser.add_argument("--source", default="proc", help="proc[:iface] | cmd:<command> | synthetic")
+    parser.add_argument("--transport", choices=sorted(SENDERS), default="http")
+    parser.add_argument("--rate", type=float, default=10.0, help="samples per second")
+    parser.add_argument("--batch", type=float, default=0.5, help="seconds of samples per message")
+    parser.add_argument("--buffer", type=int, default=3000, help="samples kept while the server is unreachable")
+    args = parser.parse_args()
+
+    source = make_source(args.source)
+    sender = SENDERS[args.transport](args.server)
+    pending = deque(maxlen=args.buffer)
+    period = 1.0 / args.rate
+    next_tick = time.monotonic()
+    last_send = time.monotonic()
+    print(f"INFO: link {args.link} -> {args.server} over {args.transport} @ {args.rate:g} Hz")
+    while True:
+        try:
+            rssi, noise = source.read()
+            if rssi is not None:
+                pending.append([round(time.time(), 3), rssi, noise])
+        except Exception as exc:
+            print(f"WARNING: read failed: {exc}")
+
+        if pending and time.monotonic() - last_send >= args.batch:
+            last_send = time.monotonic()
+            batch = list(pending)
+            try:
+                sender.send({"link": args.link, "samples": batch})
+                for _ in batch:
+                    pending.popleft()
+            except Exception as exc:
+                print(f"WARNING: send failed ({len(pending)} samples buffered): {exc}")
+                if args.transport == "udp":
+                    pending.clear()
+
+        next_tick += period
+        delay = next_tick - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_tick = time.monotonic()
+
+
+if __name__ == "__main__":
+    main()
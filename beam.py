@@ -1,28 +1,83 @@
 
 import asyncio
+import bisect
+import contextlib
+import dataclasses
 import datetime
+import fcntl
+import functools
+import hashlib
+import importlib.util
+import json
+import math
+import mmap
+import multiprocessing
 import os
+import queue
+import re
+import shlex
+import shutil
+import sqlite3
+import statistics
+import struct
 import subprocess
 import threading
 import time
 from collections import deque
+from multiprocessing import shared_memory
 from pathlib import Path
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response
 
-# Optional microphone support (sounddevice + numpy)
-try:
-    import numpy as np
-    import sounddevice as sd
+# Optional heavy dependencies are imported on first use, not at module load, so the server
+# is up before they (and the audio devices behind sounddevice) are ready:
+# numpy (mic, Doppler, fusion, trace replay), sounddevice (mic), Pillow (thumbnails)
+np = None
+sd = None
+NUMPY_INSTALLED = importlib.util.find_spec("numpy") is not None
+MIC_AVAILABLE = False  # set by discover_microphone()
+MIC_ERROR = "starting up"
+_import_lock = threading.Lock()
+STARTED_AT = time.time()
+
+
+def load_numpy():
+    """numpy, imported on first call (None if not installed)."""
+    global np
+    if np is None and NUMPY_INSTALLED:
+        with _import_lock:
+            if np is None:
+                import numpy
+
+                np = numpy
+    return np
+
+
+def load_sounddevice():
+    """sounddevice, imported on first call; None (with MIC_ERROR set) if it cannot load."""
+    global sd, MIC_ERROR
+    if sd is None:
+        with _import_lock:
+            try:
+                import sounddevice
+
+                sd = sounddevice
+            except Exception as exc:
+                MIC_ERROR = str(exc)
+    return sd
+
+
+def load_pillow():
+    """PIL.Image, or None if Pillow is not installed."""
+    try:
+        from PIL import Image
+    except Exception:
+        return None
+    return Image
 
-    MIC_AVAILABLE = True
-    MIC_ERROR = None
-except Exception as exc:
-    MIC_AVAILABLE = False
-    MIC_ERROR = str(exc)
 
 app = FastAPI()
 
@@ -33,39 +88,824 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-latest_rssi = None
-baseline = None
-threshold = 6  # dB drop = HUMAN detected
-mode = "air"
-thresholds = {"air": 6, "wall": 10}
-history = deque(maxlen=600)  # keep ~10 minutes of 1s samples
+
+
+class LabeledHistogram:
+    """
+    Prometheus-style cumulative histogram keyed by one label, cheap enough to
+    call on every sample: a bisect into fixed buckets and a few adds under a lock.
+    """
+
+    BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self._series = {}  # label value -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float):
+        index = bisect.bisect_left(self.BUCKETS, seconds)
+        with self._lock:
+            row = self._series.get(key)
+            if row is None:
+                row = self._series[key] = [0] * (len(self.BUCKETS) + 2)
+            row[index] += 1
+            row[-1] += seconds
+
+    @contextlib.contextmanager
+    def time(self, key: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(key, time.perf_counter() - started)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            rows = {key: list(row) for key, row in self._series.items()}
+        for key, row in sorted(rows.items()):
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + ("+Inf",), row[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{self.label}="{key}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{key}"}} {row[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{self.label}="{key}"}} {cumulative}')
+        return lines
+
+
+class LabeledCounter:
+    """Monotonic counter keyed by one label."""
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, key: str, amount: float = 1):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{{{self.label}="{key}"}} {value}')
+        return lines
+
+
+# Hot-path instrumentation, served as Prometheus text on /internal/metrics
+stage_seconds = LabeledHistogram("beam_stage_seconds", "Time spent in each sampler/serving stage.", "stage")
+loop_jitter_seconds = LabeledHistogram("beam_loop_jitter_seconds", "Deviation of sampler loop wake-ups from schedule.", "loop")
+events_total = LabeledCounter("beam_events_total", "Counts of sampler and serving events.", "event")
+
+
+# History series share one sequence counter so a single client cursor covers all of them
+history_lock = threading.RLock()
+_last_seq = 0
+STREAM_EPOCH = str(int(time.time() * 1000))  # changes on restart so stale cursors resync
+
+
+class SeqWaiters:
+    """
+    Wakes /metrics long-polls when the shared seq or the epoch moves. Each
+    waiter is an asyncio.Event on its own loop; `notify` may be called from
+    any thread (samplers, the state mirror) and sets them thread-safely.
+    """
+
+    def __init__(self):
+        self._waiters = set()
+        self._lock = threading.Lock()
+
+    async def wait_until(self, ready, timeout: float):
+        """Block until `ready()` is true or `timeout` seconds pass."""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            deadline = time.monotonic() + timeout
+            while not ready():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(event.wait(), remaining)
+                event.clear()
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def notify(self):
+        if not self._waiters:
+            return
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            with contextlib.suppress(RuntimeError):  # loop already closed
+                loop.call_soon_threadsafe(event.set)
+
+
+seq_waiters = SeqWaiters()
+
+
+class SampleSeries:
+    """
+    Bounded history of (seq, ts, value) samples for cursor-based streaming.
+
+    Series with `shared_seq` (the streamed ones) number samples from the global
+    `_last_seq`; others keep their own counter so they don't wake /metrics
+    readers or change its ETag.
+    """
+
+    def __init__(self, key: str, maxlen: int = 600, min_interval: float = 0.0, shared_seq: bool = True):
+        self.key = key
+        self.min_interval = min_interval  # drop samples arriving faster than this
+        self.shared_seq = shared_seq
+        self._items = deque(maxlen=maxlen)
+        self._seq = 0  # last seq handed out, when not shared
+        self.evicted_seq = 0  # seq of the newest sample pushed out of the window
+
+    def __len__(self):
+        return len(self._items)
+
+    def append(self, ts: float, value):
+        global _last_seq
+        with history_lock:
+            if self._items and ts - self._items[-1][1] < self.min_interval:
+                return None
+            if len(self._items) == self._items.maxlen:
+                self.evicted_seq = self._items[0][0]
+            if self.shared_seq:
+                _last_seq += 1
+                seq = _last_seq
+            else:
+                self._seq += 1
+                seq = self._seq
+            self._items.append((seq, ts, value))
+        if self.shared_seq:
+            seq_waiters.notify()
+        return seq
+
+    def items_since(self, cursor: int = 0):
+        """Raw (seq, ts, value) samples newer than the cursor, for mirroring to other workers."""
+        with history_lock:
+            newer = []
+            for item in reversed(self._items):
+                if item[0] <= cursor:
+                    break
+                newer.append(item)
+            newer.reverse()
+            return newer
+
+    def mirror(self, items, evicted_seq: int = None):
+        """
+        Append samples produced by another process, keeping their seqs and
+        skipping any already held. Passing `evicted_seq` replaces the contents.
+        """
+        with history_lock:
+            if evicted_seq is not None:
+                self._items.clear()
+                self.evicted_seq = evicted_seq
+            for seq, ts, value in items:
+                if self._items and seq <= self._items[-1][0]:
+                    continue
+                if len(self._items) == self._items.maxlen:
+                    self.evicted_seq = self._items[0][0]
+                self._items.append((seq, ts, value))
+
+    def has_gap(self, cursor: int) -> bool:
+        """True if samples newer than the cursor have already been evicted."""
+        return cursor < self.evicted_seq
+
+    def points(self, cursor: int = 0):
+        """Samples newer than the cursor, oldest first, in wire format."""
+        with history_lock:
+            newer = []
+            for seq, ts, val in reversed(self._items):
+                if seq <= cursor:
+                    break
+                newer.append({"t": int(ts * 1000), self.key: val})
+            newer.reverse()
+            return newer
+
+
+class SeriesSegment:
+    """
+    One UTC day of one series: an append-only file of fixed-size little-endian
+    float64 records (timestamp first), memory-mapped so reads and writes never
+    touch the Python heap. The header holds a magic tag and the record count.
+    """
+
+    HEADER = struct.Struct("<8sQ")
+    MAGIC = b"BEAMTS01"
+    GROW_BYTES = 1 << 20
+
+    def __init__(self, path: Path, fields: int, readonly: bool = False):
+        self.path = path
+        self.record = struct.Struct("<" + "d" * fields)
+        if readonly:
+            self._file = open(path, "rb")
+            if os.fstat(self._file.fileno()).st_size < self.HEADER.size:
+                self._file.close()
+                raise ValueError(f"truncated segment {path}")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(path, "r+b" if path.exists() else "w+b")
+            if os.fstat(self._file.fileno()).st_size < self.HEADER.size:
+                self._file.truncate(self.GROW_BYTES)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, count = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            if not readonly:
+                self.HEADER.pack_into(self._map, 0, self.MAGIC, 0)
+            count = 0
+        self.count = count
+        self.last_ts = self._ts(count - 1) if count else None
+
+    def _offset(self, index: int) -> int:
+        return self.HEADER.size + index * self.record.size
+
+    def _ts(self, index: int) -> float:
+        return struct.unpack_from("<d", self._map, self._offset(index))[0]
+
+    def append(self, values):
+        end = self._offset(self.count + 1)
+        if end > len(self._map):
+            size = len(self._map) + max(self.GROW_BYTES, end - len(self._map))
+            self._map.close()
+            self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        self.record.pack_into(self._map, self._offset(self.count), *values)
+        self.count += 1
+        self.HEADER.pack_into(self._map, 0, self.MAGIC, self.count)
+        self.last_ts = values[0]
+
+    def bisect(self, ts: float) -> int:
+        """Index of the first record with timestamp >= ts."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._ts(mid) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, t0: float, t1: float, limit: int):
+        start = self.bisect(t0)
+        stop = min(self.bisect(t1 + 1e-9), start + limit)
+        if stop <= start:
+            return []
+        return list(self.record.iter_unpack(self._map[self._offset(start):self._offset(stop)]))
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class SeriesStore:
+    """
+    Persistent history: <root>/<series>/<YYYYMMDD>.bin, one SeriesSegment per UTC day.
+
+    Only the segment each series is currently writing stays open; other days
+    are mapped read-only for the duration of a query.
+    """
+
+    def __init__(self, root: Path, min_interval: float = 0.0):
+        self.root = root
+        self.min_interval = min_interval  # per-series write throttle
+        self._writers = {}  # series -> (day, open segment)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _day(ts: float) -> str:
+        return time.strftime("%Y%m%d", time.gmtime(ts))
+
+    def _writer(self, series: str, day: str, fields: int) -> SeriesSegment:
+        current = self._writers.get(series)
+        if current is not None and current[0] == day:
+            return current[1]
+        if current is not None:
+            current[1].close()  # the series moved on to another day
+        segment = SeriesSegment(self.root / series / f"{day}.bin", fields)
+        self._writers[series] = (day, segment)
+        return segment
+
+    def append(self, series: str, ts: float, *values):
+        with self._lock:
+            segment = self._writer(series, self._day(ts), 1 + len(values))
+            if segment.last_ts is not None:
+                if ts - segment.last_ts < self.min_interval:
+                    return
+                ts = max(ts, segment.last_ts)  # keep each segment sorted for bisect
+            segment.append((ts, *values))
+
+    def query(self, series: str, t0: float, t1: float, limit: int = 10000, fields: int = 2):
+        """Records with t0 <= ts <= t1, oldest first, at most `limit` of them."""
+        rows = []
+        with self._lock:
+            day = t0 - t0 % 86400
+            while day <= t1 and len(rows) < limit:
+                name = self._day(day)
+                day += 86400
+                current = self._writers.get(series)
+                if current is not None and current[0] == name:
+                    rows.extend(current[1].range(t0, t1, limit - len(rows)))
+                    continue
+                path = self.root / series / f"{name}.bin"
+                if not path.exists():
+                    continue
+                try:
+                    segment = SeriesSegment(path, fields, readonly=True)
+                except (OSError, ValueError) as exc:
+                    print(f"WARNING: skipping history segment {path}: {exc}")
+                    continue
+                try:
+                    rows.extend(segment.range(t0, t1, limit - len(rows)))
+                finally:
+                    segment.close()
+        return rows
+
+    def close(self):
+        with self._lock:
+            for _, segment in self._writers.values():
+                segment.close()
+            self._writers.clear()
+
+    def series_names(self):
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+
+class RollupSet:
+    """
+    Incremental min/max/mean rollups of raw series at several resolutions.
+
+    Each resolution keeps one open bucket per series; when a sample lands in a
+    new bucket the finished one is written to the store as a 5-field record
+    (bucket start, min, max, mean, count) under "<series>@<res>s".
+    """
+
+    RESOLUTIONS = (1, 10, 60, 600)
+
+    def __init__(self, store: SeriesStore):
+        self.store = store
+        self._open = {}  # (series, res) -> [start, min, max, sum, count]
+        self._seeded = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def name(series: str, res: int) -> str:
+        return f"{series}@{res}s"
+
+    def _seed(self, series: str, ts: float):
+        # After a restart, rebuild the open buckets from raw records already on disk
+        self._seeded.add(series)
+        since = ts - ts % max(self.RESOLUTIONS)
+        for raw_ts, value in self.store.query(series, since, ts, limit=1000000):
+            self._add(series, raw_ts, value)
+
+    def _add(self, series: str, ts: float, value: float):
+        for res in self.RESOLUTIONS:
+            start = ts - ts % res
+            bucket = self._open.get((series, res))
+            if bucket is not None and bucket[0] == start:
+                bucket[1] = min(bucket[1], value)
+                bucket[2] = max(bucket[2], value)
+                bucket[3] += value
+                bucket[4] += 1
+                continue
+            if bucket is not None and start > bucket[0]:
+                self.store.append(self.name(series, res), bucket[0], bucket[1], bucket[2], bucket[3] / bucket[4], bucket[4])
+            if bucket is None or start > bucket[0]:
+                self._open[(series, res)] = [start, value, value, value, 1]
+
+    def add(self, series: str, ts: float, value: float):
+        with self._lock:
+            if series not in self._seeded:
+                self._seed(series, ts)
+            self._add(series, ts, value)
+
+    def query(self, series: str, res: int, t0: float, t1: float, limit: int):
+        """Finished buckets plus the open one, as (start, min, max, mean, count)."""
+        rows = self.store.query(self.name(series, res), t0, t1, limit=limit, fields=5)
+        with self._lock:
+            bucket = self._open.get((series, res))
+            if bucket is not None and t0 <= bucket[0] <= t1 and len(rows) < limit:
+                rows.append((bucket[0], bucket[1], bucket[2], bucket[3] / bucket[4], bucket[4]))
+        return rows
+
+
+def lttb(points, n: int):
+    """Largest-triangle-three-buckets downsampling of (t, v) points to n points."""
+    if n >= len(points) or n < 3:
+        return list(points)
+    sampled = [points[0]]
+    every = (len(points) - 2) / (n - 2)
+    a = 0
+    for i in range(n - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, len(points))
+        span = avg_end - avg_start
+        avg_t = sum(p[0] for p in points[avg_start:avg_end]) / span
+        avg_v = sum(p[1] for p in points[avg_start:avg_end]) / span
+        ax, ay = points[a]
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            tx, tv = points[j]
+            area = abs((ax - avg_t) * (tv - ay) - (ax - tx) * (avg_v - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax_decimate(buckets, n: int):
+    """
+    Reduce (t, min, max) rows to at most n points by keeping the extremes of
+    each group, emitted in time order so spikes survive decimation.
+    """
+    groups = max(1, n // 2)
+    if len(buckets) * 2 <= n:
+        groups = len(buckets)
+    size = len(buckets) / groups
+    out = []
+    for g in range(groups):
+        chunk = buckets[int(g * size):int((g + 1) * size)]
+        if not chunk:
+            continue
+        lo = min(chunk, key=lambda row: row[1])
+        hi = max(chunk, key=lambda row: row[2])
+        first, second = sorted(((lo[0], lo[1]), (hi[0], hi[2])))
+        out.append(first)
+        if second != first:
+            out.append(second)
+    return out
+
+
+def downsample_series(series: str, t0: float, t1: float, max_points: int, method: str = "lttb"):
+    """
+    At most `max_points` visually faithful points for a window: raw samples when
+    they fit, else the finest rollup with <= 4x max_points buckets, then LTTB
+    (on bucket means) or min-max decimation. Returns (resolution, points).
+    """
+    budget = max_points * 4
+    raw = series_store.query(series, t0, t1, limit=budget + 1)
+    if len(raw) <= budget:
+        resolution = "raw"
+        rows = [(ts, v, v) for ts, v in raw]
+        means = raw
+    else:
+        res = next((r for r in RollupSet.RESOLUTIONS if (t1 - t0) / r <= budget), RollupSet.RESOLUTIONS[-1])
+        resolution = f"{res}s"
+        buckets = rollups.query(series, res, t0, t1, limit=budget * 2)
+        rows = [(start, lo, hi) for start, lo, hi, _, _ in buckets]
+        means = [(start, mean) for start, _, _, mean, _ in buckets]
+    if method == "minmax":
+        return resolution, minmax_decimate(rows, max_points) if len(rows) > max_points // 2 else means
+    return resolution, lttb(means, max_points)
+
+
+# Persistent history (weeks of samples on disk; the deques above are only the live window).
+# Off by default while replaying a trace: its past timestamps would land out of order in the live store.
+STORE_ENABLED = os.environ.get("BEAM_STORE", "0" if os.environ.get("TRACE_REPLAY") else "1") != "0"
+STORE_MIN_INTERVAL = float(os.environ.get("BEAM_STORE_INTERVAL", 0.05))  # <= 20 records/s per series
+DATA_DIR = Path(os.environ.get("BEAM_DATA_DIR", "data"))
+series_store = SeriesStore(DATA_DIR / "series", min_interval=STORE_MIN_INTERVAL) if STORE_ENABLED else None
+rollups = RollupSet(series_store) if series_store is not None else None
+SERIES_KEYS = {"rssi": "rssi", "noise": "noise", "mic": "level", "doppler": "score"}
+
+
+def store_sample(series: str, ts: float, value):
+    if series_store is None or value is None:
+        return
+    try:
+        value = float(value)
+        rollups.add(series, ts, value)
+        series_store.append(series, ts, value)
+    except Exception as exc:
+        print(f"WARNING: failed to persist {series} sample: {exc}")
+
+
+class EventLog:
+    """
+    Detection episodes in SQLite (WAL): one row per episode, inserted when it
+    starts and completed when it ends. Peaks are tracked in memory while the
+    episode runs. Reads use a connection per thread, so queries never wait on
+    the sampler's writes.
+    """
+
+    SENSORS = {"rssi": 1, "mic": 2, "doppler": 4}
+    COLUMNS = ("id", "start_ts", "end_ts", "mode", "threshold", "baseline", "min_rssi", "peak_drop",
+               "peak_probability", "sensors", "contributions", "photos")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.current = None  # the open episode, owned by the sampler thread
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._local = threading.local()
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY,
+                start_ts REAL NOT NULL,
+                end_ts REAL,
+                mode TEXT NOT NULL,
+                threshold REAL,
+                baseline REAL,
+                min_rssi REAL,
+                peak_drop REAL,
+                peak_probability REAL,
+                sensors INTEGER NOT NULL DEFAULT 1,
+                contributions TEXT,
+                photos TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE INDEX IF NOT EXISTS events_start ON events (start_ts);
+            CREATE INDEX IF NOT EXISTS events_mode_start ON events (mode, start_ts);
+        """)
+        return conn
+
+    def _write(self, sql: str, params=()):
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            with self._writer:
+                return self._writer.execute(sql, params).lastrowid
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @staticmethod
+    def _drop(baseline, rssi):
+        return round(baseline - rssi, 2) if baseline is not None and rssi is not None else None
+
+    def open_episode(self, ts: float, snapshot, rssi: float):
+        """Start an episode at a fused detection edge; returns its id (None if it could not be written)."""
+        try:
+            event_id = self._write(
+                "INSERT INTO events (start_ts, mode, threshold, baseline, min_rssi, peak_drop, sensors) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (ts, snapshot.mode, snapshot.threshold, snapshot.baseline, rssi, self._drop(snapshot.baseline, rssi)),
+            )
+        except Exception as exc:
+            print(f"WARNING: failed to record detection event: {exc}")
+            return None
+        self.current = {
+            "id": event_id,
+            "baseline": snapshot.baseline,
+            "min_rssi": rssi,
+            "peak_probability": None,
+            "sensors": 0,
+            "contributions": {},
+        }
+        return event_id
+
+    def observe(self, snapshot, rssi: float, fused: dict = None, rssi_detected: bool = False):
+        """Fold one in-episode sample into the running peaks and the set of sensors that fired."""
+        episode = self.current
+        if episode is None:
+            return
+        if rssi is not None and (episode["min_rssi"] is None or rssi < episode["min_rssi"]):
+            episode["min_rssi"] = rssi
+        if rssi_detected:
+            episode["sensors"] |= self.SENSORS["rssi"]
+        if snapshot.mic_level is not None and snapshot.mic_baseline is not None \
+                and snapshot.mic_level >= snapshot.mic_baseline + snapshot.mic_threshold:
+            episode["sensors"] |= self.SENSORS["mic"]
+        if snapshot.doppler_score is not None and snapshot.doppler_score >= DOPPLER_SCORE_THRESHOLD:
+            episode["sensors"] |= self.SENSORS["doppler"]
+        if fused is not None:
+            if episode["peak_probability"] is None or fused["probability"] > episode["peak_probability"]:
+                episode["peak_probability"] = fused["probability"]
+            for name, llr in fused["contributions"].items():
+                episode["contributions"][name] = max(llr, episode["contributions"].get(name, llr))
+
+    def close_episode(self, ts: float):
+        episode, self.current = self.current, None
+        if episode is None:
+            return
+        try:
+            self._write(
+                "UPDATE events SET end_ts = ?, min_rssi = ?, peak_drop = ?, peak_probability = ?, sensors = ?, "
+                "contributions = ? WHERE id = ?",
+                (
+                    ts,
+                    episode["min_rssi"],
+                    self._drop(episode["baseline"], episode["min_rssi"]),
+                    episode["peak_probability"],
+                    episode["sensors"],
+                    json.dumps({k: round(v, 3) for k, v in episode["contributions"].items()}),
+                    episode["id"],
+                ),
+            )
+        except Exception as exc:
+            print(f"WARNING: failed to close detection event {episode['id']}: {exc}")
+
+    def add_photo(self, event_id: int, filename: str):
+        """Link a capture to its episode; photos can land after the episode has ended."""
+        try:
+            self._write("UPDATE events SET photos = json_insert(photos, '$[#]', ?) WHERE id = ?", (filename, event_id))
+        except Exception as exc:
+            print(f"WARNING: failed to link photo to event {event_id}: {exc}")
+
+    def _row(self, row) -> dict:
+        event = dict(zip(self.COLUMNS, row))
+        start, end = event.pop("start_ts"), event.pop("end_ts")
+        mask = event["sensors"]
+        event.update(
+            start=int(start * 1000),
+            end=int(end * 1000) if end is not None else None,  # None: still running, or interrupted
+            duration=round(end - start, 3) if end is not None else None,
+            sensors=[name for name, bit in self.SENSORS.items() if mask & bit],
+            contributions=json.loads(event["contributions"]) if event["contributions"] else {},
+            photos=[f"/photos/{os.path.basename(p)}" for p in json.loads(event["photos"])],
+        )
+        return event
+
+    def query(self, t0: float = None, t1: float = None, mode: str = None, sensor: str = None,
+              min_duration: float = None, limit: int = 100, before: tuple = None):
+        """
+        Newest-first page of episodes starting in [t0, t1]. `before` is the
+        (start_ts, id) of the last row of the previous page (keyset pagination,
+        so deep pages cost the same as the first).
+        """
+        where, params = [], []
+        if mode is not None:
+            where.append("mode = ?")
+            params.append(mode)
+        if t0 is not None:
+            where.append("start_ts >= ?")
+            params.append(t0)
+        if t1 is not None:
+            where.append("start_ts <= ?")
+            params.append(t1)
+        if before is not None:
+            where.append("(start_ts < ? OR (start_ts = ? AND id < ?))")
+            params += [before[0], before[0], before[1]]
+        if sensor is not None:
+            where.append("sensors & ? != 0")
+            params.append(self.SENSORS[sensor])
+        if min_duration is not None:
+            where.append("end_ts - start_ts >= ?")
+            params.append(min_duration)
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY start_ts DESC, id DESC LIMIT ?"
+        rows = self._reader().execute(sql, params + [limit]).fetchall()
+        next_before = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+        return [self._row(row) for row in rows], next_before
+
+    def get(self, event_id: int):
+        row = self._reader().execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM events WHERE id = ?", (event_id,)
+        ).fetchone()
+        return self._row(row) if row is not None else None
+
+
+EVENTS_ENABLED = os.environ.get("BEAM_EVENTS", "0" if os.environ.get("TRACE_REPLAY") else "1") != "0"
+event_log = EventLog(DATA_DIR / "events.db") if EVENTS_ENABLED else None
+
+
+@dataclasses.dataclass(frozen=True)
+class SensorState:
+    """
+    One consistent view of the live readings and detector settings. Never
+    mutated: writers publish a new version through `StateCell`, readers take
+    the current object once and use it for everything they build.
+    """
+
+    version: int = 0
+    updated: float = 0.0
+    rssi: float = None
+    baseline: float = None
+    detected: bool = False  # fused decision, remade with every RSSI sample and audio block
+    rssi_detected: bool = False
+    fusion: dict = None  # FusionEngine result behind `detected`; None until the baselines are ready
+    mode: str = "air"
+    threshold: int = 6  # dB drop = HUMAN detected
+    thresholds: dict = dataclasses.field(default_factory=lambda: {"air": 6, "wall": 10, "cusum": 6})  # copy-on-write
+    mic_level: float = None  # dBFS-ish, tracked separately from RSSI
+    mic_baseline: float = None
+    mic_threshold: int = 6  # dB increase = HUMAN detected
+    doppler_score: float = None
+    doppler_shift_hz: float = None
+    last_photo: str = None
+
+
+class StateCell:
+    """Holds the current SensorState; `publish` swaps in a new version atomically."""
+
+    def __init__(self, initial: SensorState):
+        self._state = initial
+        self._lock = threading.Lock()
+
+    def get(self) -> SensorState:
+        return self._state
+
+    def publish(self, **changes) -> SensorState:
+        return self.publish_with(lambda state: changes)
+
+    def publish_with(self, fn) -> SensorState:
+        """Read-modify-write: `fn(current)` returns the fields to change."""
+        with self._lock:
+            current = self._state
+            self._state = dataclasses.replace(current, version=current.version + 1, updated=time.time(), **fn(current))
+            return self._state
+
+
+sensor_state = StateCell(SensorState())
+DETECTION_HYSTERESIS_DB = float(os.environ.get("DETECTION_HYSTERESIS_DB", 1.0))  # threshold modes release margin
+DETECTION_MIN_DWELL = float(os.environ.get("DETECTION_MIN_DWELL", 0.0))  # seconds a state change must persist
+CUSUM_H = float(os.environ.get("CUSUM_H", 5.0))  # alarm level, in baseline sigmas
+CUSUM_RELEASE = float(os.environ.get("CUSUM_RELEASE", 0.3))  # release below this fraction of CUSUM_H
+HISTORY_INTERVAL = 0.95  # charted history keeps ~1 point/s whatever the sampling rate
+history = SampleSeries("rssi", maxlen=600, min_interval=HISTORY_INTERVAL)  # keep ~10 minutes of 1s samples
+rssi_frames = deque(maxlen=500)  # recent raw (ts, rssi) at the sampling rate, for fusion
 BASELINE_PATH = Path("baseline.txt")
+BASELINE_STATE_PATH = Path("baseline_state.json")  # adaptive tracker state for RSSI, mic and Doppler
+BASELINE_SAVE_INTERVAL = 60  # seconds between tracker state saves
 
-# Photo capture + detection tracking
-last_photo_path = None
-last_detected = False
+# RSSI source selection: auto | wdutil | proc[:iface] | file:<path>
+RSSI_SOURCE = os.environ.get("RSSI_SOURCE", "auto")
+RSSI_RATE_HZ = min(50.0, max(0.1, float(os.environ.get("RSSI_RATE_HZ", 1))))
+rssi_source = None
 
-# Microphone levels (dBFS-ish), tracked separately from RSSI
-latest_mic_level = None
-mic_baseline = None
-mic_threshold = 6  # dB increase = HUMAN detected
-mic_history = deque(maxlen=600)
+# Photo capture
+# Camera backend: imagesnap | v4l2[:/dev/videoN] | cmd:<command with {path}> | fake
+CAMERA = os.environ.get("CAMERA", "imagesnap")
+PHOTO_BURST = int(os.environ.get("PHOTO_BURST", 3))  # captures allowed per burst window
+PHOTO_BURST_WINDOW = float(os.environ.get("PHOTO_BURST_WINDOW", 10))
+PHOTO_COOLDOWN = float(os.environ.get("PHOTO_COOLDOWN", 30))  # pause after a full burst
+PHOTO_DIR = Path(os.environ.get("PHOTO_DIR", "photos"))
+PHOTO_MAX_BYTES = float(os.environ.get("PHOTO_MAX_MB", 2048)) * 1e6  # retention: total size...
+PHOTO_MAX_AGE = float(os.environ.get("PHOTO_MAX_AGE_DAYS", 30)) * 86400  # ...and age (0 keeps forever)
+PHOTO_THUMB_SIZE = int(os.environ.get("PHOTO_THUMB_SIZE", 320))  # longest thumbnail side, px
+
+# Microphone levels
+mic_history = SampleSeries("level", maxlen=600, min_interval=HISTORY_INTERVAL)
+mic_frames = deque(maxlen=500)  # recent per-block (ts, level), for fusion
 MIC_BASELINE_PATH = Path("mic_baseline.txt")
 MIC_DEVICE = os.environ.get("MIC_DEVICE")  # optional device name or index
 
+# Sensor traces: record live RSSI + raw audio, or replay a recording instead of the hardware
+TRACE_RECORD = os.environ.get("TRACE_RECORD")
+TRACE_REPLAY = os.environ.get("TRACE_REPLAY")
+TRACE_SPEED = float(os.environ.get("TRACE_SPEED", 1))  # 0 = as fast as possible
+TRACE_LOOP = os.environ.get("TRACE_LOOP", "0") == "1"
+trace_writer = None
+trace_replay = None
+
 # Doppler-style motion score around a high-frequency carrier
 DOPPLER_CARRIER_HZ = 19000
 DOPPLER_BAND_HZ = 400
 DOPPLER_SCORE_THRESHOLD = 0.02
 DOPPLER_SAMPLERATE = 48000
 DOPPLER_FRAMES = 2048
-doppler_score = None
-doppler_history = deque(maxlen=600)
-_doppler_prev_band = None
+DOPPLER_FRAME_RATE = 50  # target STFT frames per second (hop is kept at 50-75% overlap)
+# Back end: "fft" (full rfft per frame, one carrier) or "sdft" (sliding DFT of only the bins
+# around each of DOPPLER_CARRIERS, e.g. "18000,19000,20500")
+DOPPLER_BACKEND = os.environ.get("DOPPLER_BACKEND", "fft")
+DOPPLER_CARRIERS = tuple(float(hz) for hz in os.environ.get("DOPPLER_CARRIERS", str(DOPPLER_CARRIER_HZ)).split(","))
+DOPPLER_BIN_HZ = float(os.environ.get("DOPPLER_BIN_HZ", 100))  # sliding-DFT bin spacing
+DOPPLER_MIN_SNR = float(os.environ.get("DOPPLER_MIN_SNR", 4))  # carrier vs median band magnitude; below = masked
+doppler_history = SampleSeries("score", maxlen=600, min_interval=HISTORY_INTERVAL)
+doppler_frames = deque(maxlen=DOPPLER_FRAME_RATE * 10)  # recent per-frame (ts, score, shift_hz)
+
+# Series streamed to clients, in wire order
+STREAM_SERIES = (("history", history), ("mic_history", mic_history), ("doppler_history", doppler_history))
 
 # Mic samplerate (defaults to Doppler samplerate)
 MIC_SAMPLERATE = int(os.environ.get("MIC_SAMPLERATE", DOPPLER_SAMPLERATE))
 
+# Continuous capture: one callback stream feeding a ring buffer that all audio consumers share
+AUDIO_BLOCKSIZE = int(os.environ.get("AUDIO_BLOCKSIZE", 1024))
+AUDIO_RING_SECONDS = float(os.environ.get("AUDIO_RING_SECONDS", 10))
+audio_ring = None
+audio_capture = None
+# thread: capture + DSP inside this process; process: both in a child, features sent back
+DSP_WORKER = os.environ.get("DSP_WORKER", "thread")
+dsp_process = None
+
 
 def read_rssi_wdutil():
     try:
@@ -98,14 +938,324 @@ def read_rssi_wdutil():
     return rssi, noise
 
 
+class RssiSource:
+    """Interface for RSSI readers: `read()` returns (timestamp, rssi_dbm, noise_dbm)."""
+
+    name = "none"
+
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class WdutilRssiSource(RssiSource):
+    """macOS: parse `sudo wdutil info` (one subprocess per sample)."""
+
+    name = "wdutil"
+
+    def read(self):
+        rssi, noise = read_rssi_wdutil()
+        return time.time(), rssi, noise
+
+
+class ProcWirelessRssiSource(RssiSource):
+    """Linux: read signal level and noise from /proc/net/wireless in-process."""
+
+    name = "proc"
+
+    def __init__(self, interface: str = None, path: str = "/proc/net/wireless"):
+        self.interface = interface
+        self.path = path
+        self._file = None
+
+    def read(self):
+        if self._file is None:
+            self._file = open(self.path)
+        self._file.seek(0)
+        lines = self._file.read().splitlines()[2:]  # skip the two header lines
+        for line in lines:
+            iface, _, rest = line.partition(":")
+            if self.interface and iface.strip() != self.interface:
+                continue
+            fields = rest.split()
+            try:
+                level = int(float(fields[2].rstrip(".")))
+                noise = int(float(fields[3].rstrip(".")))
+            except (IndexError, ValueError):
+                continue
+            # Some drivers report unsigned dBm; -256 means "not available"
+            if level > 0:
+                level -= 256
+            if noise > 0:
+                noise -= 256
+            return time.time(), level, (noise if noise > -256 else None)
+        return time.time(), None, None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class FileRssiSource(RssiSource):
+    """
+    Fake source for testing: replays `rssi [noise]` lines from a text file
+    (blank lines and # comments ignored), looping at the end.
+    """
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._samples = []
+        for line in Path(path).read_text().splitlines():
+            parts = line.split("#", 1)[0].split()
+            if parts:
+                rssi = int(float(parts[0]))
+                noise = int(float(parts[1])) if len(parts) > 1 else None
+                self._samples.append((rssi, noise))
+        self._index = 0
+
+    def read(self):
+        if not self._samples:
+            return time.time(), None, None
+        rssi, noise = self._samples[self._index % len(self._samples)]
+        self._index += 1
+        return time.time(), rssi, noise
+
+
+def _proc_wireless_has_interface(path: str = "/proc/net/wireless") -> bool:
+    try:
+        return len(Path(path).read_text().splitlines()) > 2
+    except OSError:
+        return False
+
+
+def make_rssi_source(spec: str = RSSI_SOURCE) -> RssiSource:
+    """Build the RSSI source named by `spec` (see RSSI_SOURCE)."""
+    kind, _, arg = spec.partition(":")
+    if kind == "auto":
+        kind = "proc" if _proc_wireless_has_interface() else "wdutil"
+    if kind == "proc":
+        return ProcWirelessRssiSource(interface=arg or None)
+    if kind == "file":
+        return FileRssiSource(arg)
+    if kind == "wdutil":
+        return WdutilRssiSource()
+    raise ValueError(f"unknown RSSI source: {spec}")
+
+
+class AudioRing:
+    """
+    Preallocated single-writer ring of mono float32 samples.
+
+    Every sample is stored twice (at i and i + capacity), so any window of up to
+    `capacity` samples is one contiguous NumPy view and readers never copy. The
+    writer only publishes `write_pos` after the data is in place, so readers need
+    no lock; a view stays valid until the writer laps it (see `is_valid`).
+    """
+
+    def __init__(self, capacity: int, samplerate: int):
+        load_numpy()
+        self.capacity = capacity
+        self.samplerate = samplerate
+        self._buf = np.zeros(2 * capacity, dtype=np.float32)
+        self.write_pos = 0  # total samples ever written
+        self.last_ts = None  # wall-clock time of the newest sample
+        self.overruns = 0
+        self._ready = threading.Event()
+
+    def write(self, block, ts: float):
+        n = len(block)
+        if n > self.capacity:
+            block = block[-self.capacity:]
+            n = self.capacity
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        for offset in (0, self.capacity):
+            self._buf[offset + start:offset + start + first] = block[:first]
+            if n > first:
+                self._buf[offset:offset + n - first] = block[first:]
+        self.last_ts = ts
+        self.write_pos += n
+        self._ready.set()
+
+    def wait(self, timeout: float) -> bool:
+        """Block until new samples arrive (or timeout); True if data is ready."""
+        ready = self._ready.wait(timeout)
+        self._ready.clear()
+        return ready
+
+    def view(self, start: int, end: int):
+        """Zero-copy view of absolute sample positions [start, end)."""
+        start = max(start, end - self.capacity, 0)
+        offset = start % self.capacity
+        return self._buf[offset:offset + (end - start)]
+
+    def latest(self, frames: int):
+        end = self.write_pos
+        return self.view(end - frames, end)
+
+    def read_since(self, cursor: int):
+        """Samples written after `cursor`, plus the cursor to pass next time."""
+        end = self.write_pos
+        if cursor < end - self.capacity:
+            self.overruns += 1
+            cursor = end - self.capacity
+        return self.view(cursor, end), end
+
+    def is_valid(self, start: int) -> bool:
+        """False once the writer has overwritten the sample at `start`."""
+        return start >= self.write_pos - self.capacity
+
+    def timestamp_at(self, pos: int) -> float:
+        """Approximate wall-clock time of the sample at absolute position `pos`."""
+        if self.last_ts is None:
+            return time.time()
+        return self.last_ts - (self.write_pos - pos) / self.samplerate
+
+
+class SharedAudioRing(AudioRing):
+    """
+    AudioRing whose mirrored buffer lives in a multiprocessing.shared_memory
+    block, so the DSP worker process writes it and the web process can still
+    read raw audio without copies. The write position and newest timestamp sit
+    in a float64 header and are published after the data, as in AudioRing.
+    Other processes cannot see the threading.Event, so `wait` polls.
+    """
+
+    HEADER = 2  # float64 slots: write_pos, last_ts
+
+    def __init__(self, capacity: int, samplerate: int, name: str = None):
+        load_numpy()
+        size = 8 * self.HEADER + 4 * 2 * capacity
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.owner = name is None
+        self._meta = np.ndarray((self.HEADER,), dtype=np.float64, buffer=self.shm.buf)
+        self._buf = np.ndarray((2 * capacity,), dtype=np.float32, buffer=self.shm.buf, offset=8 * self.HEADER)
+        if self.owner:
+            self._meta[:] = (0.0, math.nan)
+        self.capacity = capacity
+        self.samplerate = samplerate
+        self.overruns = 0
+        self._ready = threading.Event()
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def write_pos(self) -> int:
+        return int(self._meta[0])
+
+    @write_pos.setter
+    def write_pos(self, value: int):
+        self._meta[0] = value
+
+    @property
+    def last_ts(self):
+        ts = float(self._meta[1])
+        return None if math.isnan(ts) else ts
+
+    @last_ts.setter
+    def last_ts(self, value):
+        self._meta[1] = math.nan if value is None else value
+
+    def wait(self, timeout: float) -> bool:
+        start = self.write_pos
+        deadline = time.monotonic() + timeout
+        while self.write_pos == start:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.002)
+        return True
+
+    def close(self):
+        self._meta = self._buf = None  # views must go before the mapping
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class AudioCapture:
+    """One persistent callback-mode InputStream that writes into an AudioRing."""
+
+    def __init__(self, ring: AudioRing, device=None, blocksize: int = AUDIO_BLOCKSIZE):
+        self.ring = ring
+        self.device = device
+        self.blocksize = blocksize
+        self.status_errors = 0
+        self.stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        if status:
+            self.status_errors += 1
+        self.ring.write(indata[:, 0], time.time())
+
+    def start(self):
+        if load_sounddevice() is None:  # the DSP worker process imports it here
+            raise RuntimeError(MIC_ERROR)
+        self.stream = sd.InputStream(
+            device=self.device,
+            channels=1,
+            samplerate=self.ring.samplerate,
+            dtype="float32",
+            blocksize=self.blocksize,
+            callback=self._callback,
+        )
+        self.stream.start()
+
+    def close(self):
+        if self.stream is not None:
+            try:
+                self.stream.close()
+            except Exception:
+                pass
+            self.stream = None
+
+
+def start_audio_capture():
+    """Open the shared capture stream (once) and return its ring buffer."""
+    global audio_ring, audio_capture
+    if audio_capture is not None:
+        return audio_ring
+    device = sd.default.device[0] if isinstance(sd.default.device, (list, tuple)) else sd.default.device
+    samplerate = int(sd.default.samplerate or MIC_SAMPLERATE)
+    ring = AudioRing(int(AUDIO_RING_SECONDS * samplerate), samplerate)
+    capture = AudioCapture(ring, device=device)
+    capture.start()
+    audio_ring, audio_capture = ring, capture
+    return ring
+
+
+def stop_audio_capture():
+    global audio_capture
+    if audio_capture is not None:
+        audio_capture.close()
+        audio_capture = None
+
+
+def _level_dbfs(audio) -> float:
+    rms = float(np.sqrt(np.mean(np.square(audio))))
+    if rms <= 1e-9:
+        return -120.0
+    return round(20 * np.log10(rms), 1)
+
+
 def read_mic_level(duration: float = 0.25, samplerate: int = 16000):
     """
     Sample the default microphone and return RMS level in dBFS-ish.
+    Uses the shared capture ring when it is running instead of opening the device again.
     Returns None if microphone support is unavailable or sampling fails.
     """
     if not MIC_AVAILABLE:
         return None
 
+    if audio_ring is not None and audio_ring.write_pos:
+        return _level_dbfs(audio_ring.latest(int(duration * audio_ring.samplerate)))
+
     try:
         frames = max(1, int(duration * samplerate))
         audio = sd.rec(frames, samplerate=samplerate, channels=1, dtype="float32")
@@ -154,317 +1304,2799 @@ def init_microphone():
             sd.default.device = (input_indices[0], current_out)
             info = sd.query_devices(input_indices[0], "input")
 
-        # Pick a samplerate the device supports
-        sr = MIC_SAMPLERATE
-        try:
-            sd.check_input_settings(device=sd.default.device[0], samplerate=sr, channels=1)
-        except Exception:
-            sr = int(info.get("default_samplerate") or DOPPLER_SAMPLERATE)
-            sd.check_input_settings(device=sd.default.device[0], samplerate=sr, channels=1)
-        sd.default.samplerate = sr
-        MIC_ERROR = None
-        print(f"INFO: mic init selected device {sd.default.device[0]} -> {info.get('name')} @ {sr} Hz")
-    except Exception as exc:
-        MIC_AVAILABLE = False
-        MIC_ERROR = f"mic init failed: {exc}"
-        print(f"ERROR: mic init failed: {exc}")
+        # Pick a samplerate the device supports
+        sr = MIC_SAMPLERATE
+        try:
+            sd.check_input_settings(device=sd.default.device[0], samplerate=sr, channels=1)
+        except Exception:
+            sr = int(info.get("default_samplerate") or DOPPLER_SAMPLERATE)
+            sd.check_input_settings(device=sd.default.device[0], samplerate=sr, channels=1)
+        sd.default.samplerate = sr
+        MIC_ERROR = None
+        print(f"INFO: mic init selected device {sd.default.device[0]} -> {info.get('name')} @ {sr} Hz")
+    except Exception as exc:
+        MIC_AVAILABLE = False
+        MIC_ERROR = f"mic init failed: {exc}"
+        print(f"ERROR: mic init failed: {exc}")
+
+
+class AdaptiveBaseline:
+    """
+    O(1)-per-sample baseline tracker for one sensor.
+
+    Keeps a time-constant EWMA mean/variance and a streaming median and MAD
+    (frugal stochastic-approximation estimates whose step scales with the
+    current MAD and the time since the last sample, so behaviour does not
+    depend on sampling rate). Updates are skipped while `frozen` so a presence
+    event never drags the baseline. `calibrate()` seeds it from the exact
+    median/MAD of the most recent raw samples.
+    """
+
+    def __init__(self, tau: float = 300.0, rate: float = 0.05, min_spread: float = 0.5,
+                 window: int = 64, auto_calibrate: bool = False):
+        self.tau = tau  # EWMA time constant, seconds
+        self.rate = rate  # median/MAD step per second, in MADs
+        self.min_spread = min_spread
+        self.auto_calibrate = auto_calibrate
+        self.recent = deque(maxlen=window)
+        self.ewma = None
+        self.ewvar = 0.0
+        self.median = None
+        self.mad = None
+        self.samples = 0
+        self.frozen = False
+        self._last_ts = None
+
+    @property
+    def ready(self) -> bool:
+        return self.median is not None
+
+    def calibrate(self, values=None, window: float = None) -> bool:
+        """Seed from `values`, or from raw samples of the last `window` seconds (all if None)."""
+        if values is None:
+            since = self._last_ts - window if window is not None and self._last_ts is not None else None
+            values = [v for ts, v in list(self.recent) if since is None or ts >= since]  # copy: samplers append concurrently
+        values = list(values)
+        if not values:
+            return False
+        median = statistics.median(values)
+        self.median = self.ewma = median
+        self.mad = max(statistics.median(abs(v - median) for v in values), self.min_spread)
+        self.ewvar = (1.4826 * self.mad) ** 2
+        self.samples = len(values)
+        return True
+
+    def update(self, value: float, ts: float, frozen: bool = False):
+        self.recent.append((ts, value))
+        dt = 0.0 if self._last_ts is None else min(max(ts - self._last_ts, 0.0), 10.0)
+        self._last_ts = ts
+        self.frozen = frozen
+        if self.median is None:
+            if self.auto_calibrate and len(self.recent) == self.recent.maxlen:
+                self.calibrate()
+            return
+        if frozen:
+            return
+        alpha = 1.0 - math.exp(-dt / self.tau)
+        delta = value - self.ewma
+        self.ewma += alpha * delta
+        self.ewvar = (1 - alpha) * (self.ewvar + alpha * delta * delta)
+        step = self.rate * dt * self.mad
+        if value > self.median:
+            self.median += step
+        elif value < self.median:
+            self.median -= step
+        self.mad = max(self.min_spread, self.mad + (step if abs(value - self.median) > self.mad else -step))
+        self.samples += 1
+
+    def bounds(self, k: float = 3.0):
+        """Robust confidence band: median +/- k robust standard deviations."""
+        spread = k * 1.4826 * self.mad
+        return self.median - spread, self.median + spread
+
+    def status(self, digits: int = 2) -> dict:
+        if not self.ready:
+            return {"ready": False, "frozen": self.frozen}
+        lower, upper = self.bounds()
+        return {
+            "ready": True,
+            "frozen": self.frozen,
+            "center": round(self.median, digits),
+            "lower": round(lower, digits),
+            "upper": round(upper, digits),
+            "mad": round(self.mad, digits + 1),
+            "ewma": round(self.ewma, digits),
+            "ewstd": round(math.sqrt(self.ewvar), digits + 1),
+            "samples": self.samples,
+        }
+
+    def state(self) -> dict:
+        return {"ewma": self.ewma, "ewvar": self.ewvar, "median": self.median, "mad": self.mad, "samples": self.samples}
+
+    def load_state(self, state: dict):
+        self.ewma = state.get("ewma")
+        self.ewvar = state.get("ewvar", 0.0)
+        self.median = state.get("median")
+        self.mad = state.get("mad")
+        self.samples = state.get("samples", 0)
+
+
+CALIBRATION_WINDOW = 5.0  # seconds of recent samples used by /calibrate
+rssi_tracker = AdaptiveBaseline(min_spread=0.5)
+mic_tracker = AdaptiveBaseline(min_spread=0.5)
+doppler_tracker = AdaptiveBaseline(min_spread=0.001, window=256, auto_calibrate=True)
+# Guards the trackers, CUSUM and debouncer: samplers update them, control endpoints reset and retune them
+detector_lock = threading.RLock()
+BASELINE_TRACKERS = {"rssi": rssi_tracker, "mic": mic_tracker, "doppler": doppler_tracker}
+_baseline_saved_at = 0.0
+
+
+def load_baseline():
+    if not BASELINE_PATH.exists():
+        return
+    try:
+        sensor_state.publish(baseline=round(float(BASELINE_PATH.read_text().strip()), 1))
+    except Exception:
+        sensor_state.publish(baseline=None)
+
+
+def persist_baseline(value: float):
+    try:
+        BASELINE_PATH.write_text(str(value))
+    except Exception:
+        pass
+
+
+def load_mic_baseline():
+    """Load baseline microphone level if available."""
+    if not MIC_BASELINE_PATH.exists():
+        return
+    try:
+        sensor_state.publish(mic_baseline=float(MIC_BASELINE_PATH.read_text().strip()))
+    except Exception as exc:
+        print(f"WARNING: failed to load mic baseline: {exc}")
+        sensor_state.publish(mic_baseline=None)
+
+
+def persist_mic_baseline(value: float):
+    """Persist microphone baseline level to disk."""
+    try:
+        MIC_BASELINE_PATH.write_text(str(value))
+    except Exception as exc:
+        print(f"WARNING: failed to persist mic baseline: {exc}")
+
+
+def load_baseline_state():
+    """Restore adaptive trackers, falling back to the single-value baseline files."""
+    try:
+        if BASELINE_STATE_PATH.exists():
+            state = json.loads(BASELINE_STATE_PATH.read_text())
+            for name, tracker in BASELINE_TRACKERS.items():
+                if state.get(name):
+                    tracker.load_state(state[name])
+    except Exception as exc:
+        print(f"WARNING: failed to load baseline state: {exc}")
+    snapshot = sensor_state.get()
+    if not rssi_tracker.ready and snapshot.baseline is not None:
+        rssi_tracker.calibrate([snapshot.baseline])
+    if not mic_tracker.ready and snapshot.mic_baseline is not None:
+        mic_tracker.calibrate([snapshot.mic_baseline])
+
+
+def persist_baseline_state():
+    """Save tracker state next to baseline.txt (and refresh the single-value files)."""
+    global _baseline_saved_at
+    _baseline_saved_at = time.time()
+    try:
+        with detector_lock:
+            state = {name: tracker.state() for name, tracker in BASELINE_TRACKERS.items() if tracker.ready}
+        BASELINE_STATE_PATH.write_text(json.dumps(state))
+    except Exception as exc:
+        print(f"WARNING: failed to persist baseline state: {exc}")
+    snapshot = sensor_state.get()
+    if snapshot.baseline is not None:
+        persist_baseline(snapshot.baseline)
+    if snapshot.mic_baseline is not None:
+        persist_mic_baseline(snapshot.mic_baseline)
+
+
+class CameraBackend:
+    """Interface for still cameras: `capture(path)` writes one image or raises."""
+
+    name = "none"
+    extension = "jpg"
+
+    def __init__(self):
+        self.lock = threading.Lock()  # one user of the device at a time: warm-up or a capture
+
+    def capture(self, path: str):
+        raise NotImplementedError
+
+    def warm(self):
+        pass
+
+
+class ImagesnapCamera(CameraBackend):
+    """macOS: `imagesnap`, which needs a short warm-up per shot."""
+
+    name = "imagesnap"
+
+    def capture(self, path: str):
+        subprocess.run(["imagesnap", "-w", "0.8", path], check=True, timeout=15)
+
+    def warm(self):
+        try:
+            os.makedirs("photos", exist_ok=True)
+            subprocess.run(["imagesnap", "-w", "1", "photos/warmup.jpg"], check=False, timeout=15)
+        except Exception:
+            pass
+        try:
+            os.remove("photos/warmup.jpg")
+        except Exception:
+            pass
+
+
+class CommandCamera(CameraBackend):
+    """Any capture command with a `{path}` placeholder (e.g. ffmpeg reading V4L2)."""
+
+    name = "cmd"
+
+    def __init__(self, template: str):
+        super().__init__()
+        self.template = template
+
+    def capture(self, path: str):
+        subprocess.run(shlex.split(self.template.format(path=shlex.quote(path))), check=True, timeout=15)
+
+
+class FakeCamera(CameraBackend):
+    """Test backend: writes a small solid-colour BMP whose colour changes per shot."""
+
+    name = "fake"
+    extension = "bmp"
+
+    def __init__(self, width: int = 64, height: int = 48):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.shots = 0
+
+    def capture(self, path: str):
+        self.shots += 1
+        rgb = ((self.shots * 70) % 256, (self.shots * 130) % 256, (self.shots * 200) % 256)
+        row = bytes(rgb[::-1]) * self.width
+        row += bytes((4 - len(row) % 4) % 4)
+        pixels = row * self.height
+        header = struct.pack("<2sIHHI", b"BM", 54 + len(pixels), 0, 0, 54)
+        info = struct.pack("<IiiHHIIiiII", 40, self.width, self.height, 1, 24, 0, len(pixels), 2835, 2835, 0, 0)
+        Path(path).write_bytes(header + info + pixels)
+
+
+def make_camera(spec: str = CAMERA) -> CameraBackend:
+    """Build the camera backend named by `spec` (see CAMERA)."""
+    kind, _, arg = spec.partition(":")
+    if kind == "imagesnap":
+        return ImagesnapCamera()
+    if kind == "v4l2":
+        device = arg or "/dev/video0"
+        camera = CommandCamera(f"ffmpeg -loglevel error -y -f v4l2 -i {device} -frames:v 1 {{path}}")
+        camera.name = "v4l2"
+        return camera
+    if kind == "cmd":
+        return CommandCamera(arg)
+    if kind == "fake":
+        return FakeCamera()
+    raise ValueError(f"unknown camera: {spec}")
+
+
+def make_thumbnail(src: Path, dest: Path, size: int) -> bool:
+    """Write a JPEG at most `size` px on its longest side; False if no image tool is available."""
+    tmp = dest.with_name(f".{dest.name}.{threading.get_ident()}")  # the worker and a request may race
+    Image = load_pillow()
+    if Image is not None:
+        with Image.open(src) as image:
+            image.thumbnail((size, size))
+            image.convert("RGB").save(tmp, "JPEG", quality=80)
+    elif shutil.which("ffmpeg"):
+        scale = f"scale='if(gt(iw,ih),min({size},iw),-2)':'if(gt(iw,ih),-2,min({size},ih))'"
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-i", str(src), "-vf", scale, "-f", "mjpeg", str(tmp)],
+                       check=True, timeout=15)
+    else:
+        return False
+    os.replace(tmp, dest)
+    return True
+
+
+@dataclasses.dataclass
+class PhotoRecord:
+    ts: float
+    name: str
+    size: int
+
+    @property
+    def url(self) -> str:
+        return f"/photos/{self.name}"
+
+    def as_dict(self) -> dict:
+        return {"t": int(self.ts * 1000), "url": self.url, "thumb_url": f"{self.url}?size=thumb", "size": self.size}
+
+
+class PhotoStore:
+    """
+    Captures under `root`, named capture_<local time>-<content hash>.<ext>, so
+    every photo URL is immutable and can be cached forever. An in-memory index
+    (by time and by name) answers listing and serving without touching the
+    directory; retention keeps the store under `max_bytes` and `max_age`.
+    Thumbnails are made in the background, or on first request.
+    """
+
+    # Milliseconds and hash are optional: captures from before the store were capture_<stamp>.jpg
+    NAME_RE = re.compile(r"capture_(\d{8}_\d{6})(?:_(\d{3}))?(?:_\d+)?(?:-([0-9a-f]{16}))?\.(\w+)")
+    PENDING = ".pending_capture"
+
+    def __init__(self, root: Path, max_bytes: float = PHOTO_MAX_BYTES, max_age: float = PHOTO_MAX_AGE,
+                 thumb_size: int = PHOTO_THUMB_SIZE):
+        self.root = root
+        self.thumbs = root / "thumbs"
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.thumb_size = thumb_size
+        self._lock = threading.Lock()
+        self._times = []  # sorted capture times, parallel to _records
+        self._records = []
+        self._by_name = {}
+        self._thumb_jobs = queue.Queue()
+        self._thread = None
+        self.total_bytes = 0
+        self.pruned = 0
+        self.thumb_errors = 0
+
+    @staticmethod
+    def _digest(path: Path) -> str:
+        digest = hashlib.blake2b(digest_size=8)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def start(self):
+        """Start the thumbnail thread; `load` indexes existing captures separately."""
+        if self._thread is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self.thumbs.mkdir(exist_ok=True)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self._thumb_jobs.get()
+            try:
+                self.thumbnail(record.name)
+            except Exception as exc:
+                self.thumb_errors += 1
+                print(f"WARNING: thumbnail for {record.name} failed: {exc}")
+
+    def load(self):
+        """Index the directory once. Captures from before the store existed get hashed names."""
+        records = []
+        for entry in os.scandir(self.root):
+            match = self.NAME_RE.fullmatch(entry.name)
+            if match is None or not entry.is_file():
+                continue
+            stamp, millis, digest, extension = match.groups()
+            ts = datetime.datetime.strptime(stamp, "%Y%m%d_%H%M%S").timestamp() + int(millis or 0) / 1000
+            name, path = entry.name, Path(entry.path)
+            try:
+                if digest is None:
+                    name = f"{path.stem}-{self._digest(path)}.{extension}"
+                    os.replace(path, self.root / name)
+                    path = self.root / name
+                records.append(PhotoRecord(ts, name, path.stat().st_size))
+            except OSError as exc:
+                print(f"WARNING: skipping photo {entry.name}: {exc}")
+        records.sort(key=lambda r: r.ts)
+        with self._lock:
+            for record in records:
+                self._insert(record)
+        print(f"INFO: photo store: {len(records)} captures, {self.total_bytes / 1e6:.1f} MB")
+        self.prune()
+        for record in records:
+            if not (self.thumbs / f"{record.name}.jpg").exists():
+                self._thumb_jobs.put(record)
+
+    def _insert(self, record: PhotoRecord):
+        if record.name in self._by_name:
+            return
+        i = bisect.bisect_right(self._times, record.ts)
+        self._times.insert(i, record.ts)
+        self._records.insert(i, record)
+        self._by_name[record.name] = record
+        self.total_bytes += record.size
+
+    def pending_path(self, extension: str) -> Path:
+        """Where the camera writes; `commit` then gives the file its content-hashed name."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root / f"{self.PENDING}.{extension}"
+
+    def commit(self, pending: Path, ts: float) -> PhotoRecord:
+        stamp = datetime.datetime.fromtimestamp(ts)
+        extension = pending.suffix.lstrip(".")
+        name = f"capture_{stamp.strftime('%Y%m%d_%H%M%S')}_{stamp.microsecond // 1000:03d}-{self._digest(pending)}.{extension}"
+        os.replace(pending, self.root / name)
+        record = PhotoRecord(ts, name, (self.root / name).stat().st_size)
+        with self._lock:
+            self._insert(record)
+        self._thumb_jobs.put(record)
+        self.prune()
+        return self._by_name.get(name, record)
+
+    def prune(self, now: float = None):
+        """Drop the oldest captures (and thumbnails) past the size or age limit, always keeping the newest."""
+        now = time.time() if now is None else now
+        removed = []
+        with self._lock:
+            while len(self._records) > 1 and (
+                self.total_bytes > self.max_bytes or (self.max_age and self._records[0].ts < now - self.max_age)
+            ):
+                record = self._records.pop(0)
+                self._times.pop(0)
+                del self._by_name[record.name]
+                self.total_bytes -= record.size
+                removed.append(record)
+        for record in removed:
+            for path in (self.root / record.name, self.thumbs / f"{record.name}.jpg"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+        self.pruned += len(removed)
+
+    def path(self, name: str):
+        """File for a capture name; names not yet indexed (e.g. another worker's) are checked on disk."""
+        if name in self._by_name:
+            return self.root / name
+        if self.NAME_RE.fullmatch(name) and (self.root / name).is_file():
+            return self.root / name
+        return None
+
+    def thumbnail(self, name: str):
+        """Thumbnail file for a capture, made now if missing; None when no image tool is available."""
+        source = self.path(name)
+        if source is None:
+            return None
+        thumb = self.thumbs / f"{name}.jpg"
+        if thumb.exists():
+            return thumb
+        self.thumbs.mkdir(parents=True, exist_ok=True)
+        return thumb if make_thumbnail(source, thumb, self.thumb_size) else None
+
+    def latest(self):
+        with self._lock:
+            return self._records[-1] if self._records else None
+
+    def query(self, t0: float = None, t1: float = None, limit: int = 100):
+        """Newest-first captures taken in [t0, t1]."""
+        with self._lock:
+            lo = bisect.bisect_left(self._times, t0) if t0 is not None else 0
+            hi = bisect.bisect_right(self._times, t1) if t1 is not None else len(self._times)
+            return self._records[max(lo, hi - limit):hi][::-1]
+
+    def status(self) -> dict:
+        return {
+            "count": len(self._records),
+            "bytes": self.total_bytes,
+            "pruned": self.pruned,
+            "pending_thumbnails": self._thumb_jobs.qsize(),
+            "thumb_errors": self.thumb_errors,
+        }
+
+
+photo_store = PhotoStore(PHOTO_DIR)
+
+
+class PhotoWorker:
+    """
+    Dedicated capture thread so sampler loops never wait on the camera.
+
+    `request()` is non-blocking: it applies the burst/cooldown policy (at most
+    `burst` shots per `burst_window` seconds, then `cooldown` seconds of rest)
+    and enqueues into a bounded queue, dropping the request if it is full.
+    """
+
+    def __init__(self, camera: CameraBackend, queue_size: int = 4, burst: int = PHOTO_BURST,
+                 burst_window: float = PHOTO_BURST_WINDOW, cooldown: float = PHOTO_COOLDOWN):
+        self.camera = camera
+        self.burst = burst
+        self.burst_window = burst_window
+        self.cooldown = cooldown
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self._cooldown_until = 0.0
+        self._thread = None
+        self.busy = False
+        self.captures = 0
+        self.errors = 0
+        self.dropped = 0
+        self.suppressed = 0
+        self.last_capture_ts = None
+        self.last_duration = None
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def request(self, reason: str = "detection", event_id: int = None) -> bool:
+        now = time.time()
+        with self._lock:
+            if now < self._cooldown_until:
+                self.suppressed += 1
+                return False
+            while self._recent and now - self._recent[0] > self.burst_window:
+                self._recent.popleft()
+            if len(self._recent) >= self.burst:
+                self._cooldown_until = now + self.cooldown
+                self._recent.clear()
+                self.suppressed += 1
+                return False
+            self._recent.append(now)
+        try:
+            self._jobs.put_nowait((now, reason, event_id))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            requested_at, reason, event_id = self._jobs.get()
+            self.busy = True
+            pending = photo_store.pending_path(self.camera.extension)
+            started = time.monotonic()
+            try:
+                with self.camera.lock, stage_seconds.time("photo_capture"):
+                    self.camera.capture(str(pending))
+                record = photo_store.commit(pending, requested_at)
+                filename = str(photo_store.root / record.name)
+                sensor_state.publish(last_photo=filename)
+                if event_id is not None and event_log is not None:
+                    event_log.add_photo(event_id, filename)
+                self.captures += 1
+                self.last_capture_ts = time.time()
+                self.last_error = None
+            except Exception as exc:
+                self.errors += 1
+                self.last_error = str(exc)
+                print(f"ERROR capturing photo: {exc}")
+            finally:
+                self.last_duration = time.monotonic() - started
+                self.busy = False
+
+    def status(self) -> dict:
+        return {
+            "camera": self.camera.name,
+            "pending": self._jobs.qsize(),
+            "busy": self.busy,
+            "captures": self.captures,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "suppressed": self.suppressed,
+            "cooldown": time.time() < self._cooldown_until,
+            "last_capture_ms": int(self.last_capture_ts * 1000) if self.last_capture_ts else None,
+            "last_duration_ms": round(self.last_duration * 1000) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+photo_worker = PhotoWorker(make_camera())
+
+
+def take_photo(event_id: int = None):
+    """Queue a capture on the photo worker; returns immediately."""
+    return photo_worker.request(event_id=event_id)
+
+
+class CusumDetector:
+    """
+    Two-sided CUSUM on RSSI deviations from the adaptive baseline, in units of
+    the baseline's robust sigma. The drift allowance is half the shift to
+    detect; the alarm rises when either sum passes `h` and clears (hysteresis)
+    once both fall below `release * h`. Sums are capped at 2h so the alarm
+    clears promptly once the signal returns.
+    """
+
+    def __init__(self, h: float = CUSUM_H, release: float = CUSUM_RELEASE):
+        self.h = h
+        self.release = release
+        self.upper = 0.0
+        self.lower = 0.0
+        self.active = False
+
+    def reset(self):
+        self.upper = self.lower = 0.0
+        self.active = False
+
+    def update(self, value: float, center: float, sigma: float, shift: float) -> bool:
+        z = (value - center) / sigma
+        k = shift / 2 / sigma
+        cap = 2 * self.h
+        self.upper = min(cap, max(0.0, self.upper + z - k))
+        self.lower = min(cap, max(0.0, self.lower - z - k))
+        peak = max(self.upper, self.lower)
+        if not self.active and peak > self.h:
+            self.active = True
+        elif self.active and peak < self.release * self.h:
+            self.active = False
+        return self.active
+
+
+class Debouncer:
+    """Commit a state change only after it has persisted for `min_dwell` seconds."""
+
+    def __init__(self, min_dwell: float = DETECTION_MIN_DWELL):
+        self.min_dwell = min_dwell
+        self.state = False
+        self._since = None
+
+    def reset(self):
+        self.state = False
+        self._since = None
+
+    def update(self, raw: bool, ts: float) -> bool:
+        if raw == self.state:
+            self._since = None
+        elif self._since is None and self.min_dwell > 0:
+            self._since = ts
+        elif self._since is None or ts - self._since >= self.min_dwell:
+            self.state = raw
+            self._since = None
+        return self.state
+
+
+cusum = CusumDetector()
+detection_debounce = Debouncer()
+
+
+def evaluate_rssi_detection(snapshot: SensorState, rssi: float, ts: float) -> bool:
+    """Raw detection for the snapshot's mode, then hysteresis/dwell debouncing."""
+    if snapshot.mode == "cusum":
+        sigma = 1.4826 * rssi_tracker.mad if rssi_tracker.ready else 1.0
+        raw = cusum.update(rssi, snapshot.baseline, sigma, snapshot.threshold)
+    else:
+        limit = snapshot.baseline - snapshot.threshold
+        if detection_debounce.state:
+            limit += DETECTION_HYSTERESIS_DB
+        raw = bool(rssi <= limit)
+    return detection_debounce.update(raw, ts)
+
+
+def reset_detection():
+    cusum.reset()
+    detection_debounce.reset()
+
+
+def mic_detected(snapshot: SensorState) -> bool:
+    if not MIC_AVAILABLE or snapshot.mic_level is None or snapshot.mic_baseline is None:
+        return False
+    return bool(snapshot.mic_level >= snapshot.mic_baseline + snapshot.mic_threshold)
+
+
+def decide_presence(ts: float, snapshot: SensorState, changes: dict, rssi: float = None):
+    """
+    Fuse the sensors at `ts` and publish the decision together with `changes`;
+    every sampler calls this, so detection keeps the fastest sensor's pace.
+    Episodes follow the fused decision, so mic- or Doppler-only detections count
+    too. Call with detector_lock held, `snapshot` read under it. Returns the new
+    episode's id (None if not recorded) on a detection edge, else False.
+    """
+    state = dataclasses.replace(snapshot, **changes)
+    with stage_seconds.time("fusion"):
+        fused = fusion.evaluate(now=ts, snapshot=state)
+    # Fall back to the per-sensor OR until the baselines are ready
+    rssi_only = state.rssi_detected and state.baseline is not None
+    detected_now = fused["detected"] if fused is not None else rssi_only or mic_detected(state)
+    sensor_state.publish(detected=detected_now, fusion=fused, **changes)
+
+    event_id = False
+    if detected_now and not snapshot.detected:
+        events_total.inc("detection")
+        event_id = event_log.open_episode(ts, state, rssi) if event_log is not None else None
+    if event_log is not None and event_log.current is not None:
+        if detected_now:
+            with stage_seconds.time("event_track"):
+                event_log.observe(state, rssi, fused, rssi_detected=rssi_only)
+        else:
+            event_log.close_episode(ts)
+    return event_id
+
+
+def process_rssi_sample(ts: float, rssi, noise):
+    """Record one RSSI/noise reading, run detection and fusion on it and publish the result."""
+    if rssi is not None:
+        history.append(ts, rssi)
+        rssi_frames.append((ts, rssi))
+        store_sample("rssi", ts, rssi)
+    store_sample("noise", ts, noise)
+
+    with detector_lock:
+        # Read under the lock so a mode change and its detector reset land between samples, never inside one
+        snapshot = sensor_state.get()
+        with stage_seconds.time("detection_eval"):
+            rssi_detected = snapshot.rssi_detected
+            if snapshot.baseline is not None and rssi is not None:
+                rssi_detected = evaluate_rssi_detection(snapshot, rssi, ts)
+
+        # Baseline follows slow drift, but never while someone is in the path
+        changes = {"rssi": rssi, "rssi_detected": rssi_detected}
+        if rssi is not None:
+            rssi_tracker.update(rssi, ts, frozen=rssi_detected)
+            if rssi_tracker.ready:
+                changes["baseline"] = round(rssi_tracker.median, 1)
+        event_id = decide_presence(ts, snapshot, changes, rssi)
+    if event_id is not False:
+        take_photo(event_id)
+    if rssi_tracker.ready and time.time() - _baseline_saved_at > BASELINE_SAVE_INTERVAL:
+        persist_baseline_state()
+
+
+def sampler_loop():
+    global rssi_source
+    period = 1.0 / RSSI_RATE_HZ
+    next_tick = time.monotonic()
+    while True:
+        loop_jitter_seconds.observe("rssi", abs(time.monotonic() - next_tick))
+        try:
+            if rssi_source is None:
+                rssi_source = make_rssi_source()
+                print(f"INFO: RSSI source {rssi_source.name} @ {RSSI_RATE_HZ:g} Hz")
+            with stage_seconds.time("rssi_read"):
+                ts, rssi, noise = rssi_source.read()
+            events_total.inc("rssi_sample" if rssi is not None else "rssi_missing")
+            if trace_writer is not None:
+                trace_writer.rssi(ts, rssi, noise)
+            process_rssi_sample(ts, rssi, noise)
+        except Exception as exc:
+            events_total.inc("rssi_error")
+            print(f"ERROR: sampler loop failed: {exc}")
+        # Fixed-rate schedule; if we fall behind, skip ahead rather than burst
+        next_tick += period
+        now = time.monotonic()
+        if next_tick < now:
+            next_tick = now
+        time.sleep(next_tick - now)
+
+
+@functools.lru_cache(maxsize=8)
+def doppler_band_plan(samplerate: int, frame_size: int, carrier_hz: float = DOPPLER_CARRIER_HZ, band_hz: float = DOPPLER_BAND_HZ):
+    """
+    Precomputed STFT geometry for one (samplerate, frame size): Hann window,
+    the contiguous slice of rfft bins inside the carrier band, their
+    frequencies, and the gain that undoes the window's amplitude loss.
+    """
+    window = np.hanning(frame_size).astype(np.float32)
+    freqs = np.fft.rfftfreq(frame_size, 1 / samplerate)
+    bins = np.flatnonzero((freqs >= carrier_hz - band_hz) & (freqs <= carrier_hz + band_hz))
+    if not bins.size:
+        return window, None, None, 1.0
+    band = slice(int(bins[0]), int(bins[-1]) + 1)
+    return window, band, freqs[band], frame_size / float(window.sum())
+
+
+class DopplerEngine:
+    """
+    Overlapping-window STFT over the audio ring.
+
+    Frames of `frame_size` samples advance by `hop` (50-75% overlap), are
+    windowed and transformed in one batched rfft, and each yields a motion
+    score (mean spectral change vs. the previous frame inside the carrier
+    band) and a Doppler shift estimate (band power centroid minus carrier).
+    """
+
+    def __init__(self, frame_size: int = DOPPLER_FRAMES, frame_rate: float = DOPPLER_FRAME_RATE,
+                 carrier_hz: float = DOPPLER_CARRIER_HZ, band_hz: float = DOPPLER_BAND_HZ):
+        self.frame_size = frame_size
+        self.frame_rate = frame_rate
+        self.carrier_hz = carrier_hz
+        self.band_hz = band_hz
+        self._ring = None  # ring that _pos refers to
+        self._pos = None  # ring position where the next frame starts
+        self._prev_band = None
+
+    def reset(self):
+        """Forget the stream position and per-frame history (new ring, or a gap in this one)."""
+        self._pos = None
+        self._prev_band = None
+
+    def hop(self, samplerate: int) -> int:
+        hop = int(samplerate / self.frame_rate)
+        return min(max(hop, self.frame_size // 4), self.frame_size // 2)
+
+    def _next_frames(self, ring: AudioRing):
+        """Frames completed since the last call, as a strided view: (start, hop, frames), or None."""
+        advanced = self._advance(ring)
+        if advanced is None:
+            return None
+        start, hop, count = advanced
+        span = ring.view(start, start + (count - 1) * hop + self.frame_size)
+        return start, hop, np.lib.stride_tricks.sliding_window_view(span, self.frame_size)[::hop]
+
+    def _advance(self, ring: AudioRing):
+        """Claim the frames completed since the last call: (start, hop, count), or None."""
+        hop = self.hop(ring.samplerate)
+        end = ring.write_pos
+        # A restarted capture or replay brings a new ring whose positions start again at 0
+        if ring is not self._ring or self._pos is None or self._pos > end or not ring.is_valid(self._pos):
+            self.reset()
+            self._ring = ring
+            self._pos = max(0, end - self.frame_size)
+        count = (end - self._pos - self.frame_size) // hop + 1
+        count = min(count, (ring.capacity - self.frame_size) // hop + 1)
+        if count <= 0:
+            return None
+        start = self._pos
+        self._pos = start + count * hop
+        return start, hop, count
+
+    def _frame_times(self, ring: AudioRing, start: int, hop: int, count: int):
+        ends = start + self.frame_size + hop * np.arange(count)
+        return [ring.timestamp_at(int(pos)) for pos in ends]
+
+    def process(self, ring: AudioRing):
+        """Analyse every complete frame written since the last call; returns (times, scores, shifts)."""
+        window, band, band_freqs, gain = doppler_band_plan(ring.samplerate, self.frame_size, self.carrier_hz, self.band_hz)
+        framed = self._next_frames(ring) if band is not None else None
+        if framed is None:
+            return (), (), ()
+        start, hop, frames = framed
+        count = len(frames)
+        spectra = np.abs(np.fft.rfft(frames * window, axis=1)[:, band]) * gain
+
+        previous = spectra[:-1]
+        if self._prev_band is not None:
+            previous = np.vstack([self._prev_band[None, :], previous])
+            scores = np.mean(np.abs(spectra - previous), axis=1)
+        else:
+            scores = np.concatenate([[np.nan], np.mean(np.abs(spectra[1:] - previous), axis=1)])
+        self._prev_band = spectra[-1]
+
+        power = np.square(spectra)
+        total = power.sum(axis=1)
+        shifts = np.where(total > 0, (power @ band_freqs) / np.maximum(total, 1e-20) - self.carrier_hz, 0.0)
+        return self._frame_times(ring, start, hop, count), scores, shifts
+
+
+@functools.lru_cache(maxsize=8)
+def sdft_bank_plan(samplerate: int, frame_size: int, hop: int, carriers: tuple, band_hz: float, bin_hz: float):
+    """
+    Sliding-DFT geometry. Around each carrier, target DFT bins every
+    round(bin_hz / resolution) bins across +/-band_hz; the recurrence tracks
+    those plus the neighbours the Hann window needs. Carriers whose band
+    passes Nyquist are dropped. Complex bases are stored as interleaved re/im
+    columns, so a real matmul result can be viewed as complex.
+    Returns None, or a dict of:
+      seed:   (frame_size, 2K) DFT of one frame, to (re)start the state
+      step, phases: (B, 2K) float32 and (hop/B, K) complex64; fold one hop of
+              new-minus-old samples into the state as hop/B blocks of B samples,
+              which keeps the twiddles small enough to stay in cache
+      rotate: (K,) phase advance of every bin over one hop
+      hann:   (K, T) tracked rectangular bins -> Hann-windowed target bins, gain-corrected
+      offsets: (C, T/C) target bin frequency minus its carrier, Hz
+    """
+    resolution = samplerate / frame_size
+    step = max(1, round(bin_hz / resolution))
+    reach = int(band_hz // (step * resolution))
+    usable = tuple(c for c in carriers if c + band_hz + 2 * resolution < samplerate / 2)
+    if not usable or reach < 1:
+        return None
+    targets = np.array([round(c / resolution) + step * np.arange(-reach, reach + 1) for c in usable])
+    bins = np.unique(np.concatenate([targets.ravel() - 1, targets.ravel(), targets.ravel() + 1]))
+    column = {k: i for i, k in enumerate(bins)}
+    hann = np.zeros((bins.size, targets.size), dtype=np.complex128)
+    # Periodic Hann: 0.5 X[k] - 0.25 (X[k-1] + X[k+1]), times its gain of 2
+    for t, k in enumerate(targets.ravel()):
+        hann[column[k], t] = 1.0
+        hann[column[k - 1], t] = hann[column[k + 1], t] = -0.5
+
+    def interleaved(phase):
+        basis = np.exp(1j * phase)
+        return np.ascontiguousarray(np.stack([basis.real, basis.imag], axis=-1).reshape(phase.shape[0], -1))
+
+    omega = 2 * np.pi * bins / frame_size
+    block = max(b for b in range(1, 65) if hop % b == 0)
+    return {
+        "carriers": usable,
+        "seed": interleaved(-np.outer(np.arange(frame_size), omega)),
+        "step": interleaved(-np.outer(np.arange(block), omega)).astype(np.float32),
+        "phases": np.exp(1j * np.outer(hop - block * np.arange(hop // block), omega)).astype(np.complex64),
+        "rotate": np.exp(1j * omega * hop),
+        "hann": hann,
+        "offsets": targets * resolution - np.asarray(usable)[:, None],
+    }
+
+
+def _masked_median(values, mask):
+    """Row-wise median of `values` over entries where `mask` is set; NaN for rows with none."""
+    if mask.all():  # the usual case: every carrier live
+        ordered = np.sort(values, axis=1)
+        columns = values.shape[1]
+        return (ordered[:, (columns - 1) // 2] + ordered[:, columns // 2]) / 2
+    n = mask.sum(axis=1)
+    ordered = np.sort(np.where(mask, values, np.inf), axis=1)
+    rows = np.arange(len(ordered))
+    middle = (ordered[rows, np.maximum(n - 1, 0) // 2] + ordered[rows, n // 2]) / 2
+    return np.where(n > 0, middle, np.nan)
+
+
+class SlidingDftBank(DopplerEngine):
+    """
+    Doppler features from a sliding DFT that tracks only the bins around
+    several carriers, instead of a full rfft per frame.
+
+    The state holds each tracked bin's DFT over the latest frame. Moving one
+    hop on is the SDFT recurrence X <- e^(jwh) * (X + sum of (new - old)
+    samples * twiddles), done for all bins as one hop x 2K matmul: about half
+    the work of transforming the whole frame, and far less than an rfft once
+    only a few dozen bins matter. The Hann window is applied afterwards in the
+    frequency domain (0.5 X[k] - 0.25 (X[k-1] + X[k+1])). The state restarts
+    from a direct DFT after a gap in the ring and every `reseed_every` frames,
+    so rounding error cannot build up.
+
+    Same framing and per-carrier score as the STFT engine. A carrier counts as
+    masked in a frame when its centre bin is less than `min_snr` times the
+    median bin of its band, e.g. drowned by ambient noise or not emitted. The
+    frame's score and shift are medians over the unmasked carriers, so one bad
+    carrier cannot trigger or hide motion; frames with every carrier masked
+    score NaN.
+    """
+
+    def __init__(self, frame_size: int = DOPPLER_FRAMES, frame_rate: float = DOPPLER_FRAME_RATE,
+                 carriers: tuple = DOPPLER_CARRIERS, band_hz: float = DOPPLER_BAND_HZ,
+                 bin_hz: float = DOPPLER_BIN_HZ, min_snr: float = DOPPLER_MIN_SNR, reseed_every: int = 3000):
+        super().__init__(frame_size, frame_rate, carriers[0], band_hz)
+        self.carriers = tuple(carriers)
+        self.bin_hz = bin_hz
+        self.min_snr = min_snr
+        self.reseed_every = reseed_every
+        self.masked = {}  # carrier -> whether it was masked in the latest frame
+        self._state = None  # complex DFT of the frame starting at _state_start
+        self._state_start = None
+        self._since_seed = 0
+
+    def reset(self):
+        super().reset()
+        self._state = None
+        self._state_start = None
+
+    def _states(self, ring: AudioRing, plan: dict, start: int, hop: int, count: int):
+        """Rectangular-window DFT of every new frame's tracked bins, shape (count, K)."""
+        n = self.frame_size
+        follow = (self._state is not None and self._state_start == start - hop and ring.is_valid(start - hop)
+                  and self._since_seed < self.reseed_every)
+        if follow:
+            steps, state = count, self._state
+            span = ring.view(start - hop, start + (count - 1) * hop + n)
+        else:
+            steps = count - 1
+            span = ring.view(start, start + steps * hop + n)
+            state = (span[:n] @ plan["seed"]).view(np.complex128)
+            self._since_seed = 0
+        self._state_start = start + (count - 1) * hop
+        self._since_seed += count
+        if not steps:
+            self._state = state
+            return state[None]
+        # Each hop, `hop` samples leave the front of the window and as many enter at its end
+        leaving = span[:steps * hop].reshape(steps, hop)
+        entering = span[n:n + steps * hop].reshape(steps, hop)
+        blocks, phases = (entering - leaving).reshape(-1, plan["step"].shape[0]), plan["phases"]
+        updates = ((blocks @ plan["step"]).view(np.complex64).reshape(steps, *phases.shape) * phases).sum(axis=1)
+        rotate = plan["rotate"]
+        if follow and steps == 1:  # the usual case: one new frame per audio block
+            self._state = state = rotate * state + updates[0]
+            return state[None]
+        states = [] if follow else [state]
+        for update in updates:
+            state = rotate * state + update
+            states.append(state)
+        self._state = state
+        return np.array(states)
+
+    def process(self, ring: AudioRing):
+        hop = self.hop(ring.samplerate)
+        plan = sdft_bank_plan(ring.samplerate, self.frame_size, hop, self.carriers, self.band_hz, self.bin_hz)
+        advanced = self._advance(ring) if plan is not None else None
+        if advanced is None:
+            return (), (), ()
+        start, hop, count = advanced
+        offsets = plan["offsets"]
+        spectra = self._states(ring, plan, start, hop, count) @ plan["hann"]
+        mags = np.abs(spectra).reshape(count, *offsets.shape)
+
+        middle = offsets.shape[1] // 2
+        live = mags[:, :, middle] > self.min_snr * np.partition(mags, middle, axis=2)[:, :, middle]
+        self.masked = {carrier: not bool(ok) for carrier, ok in zip(plan["carriers"], live[-1])}
+        # Scores and shifts go through one masked median; rows [:count] are scores
+        valid = np.concatenate([live, live])
+        previous = self._prev_band
+        if previous is None:
+            previous = mags[0]
+            valid[0] = False  # no earlier frame to compare the first one with
+        if count > 1:
+            previous = np.concatenate([previous[None], mags[:-1]])
+        self._prev_band = mags[-1]
+        power = np.square(mags)
+        features = np.concatenate([
+            np.abs(mags - previous).sum(axis=2) / offsets.shape[1],
+            (power * offsets).sum(axis=2) / np.maximum(power.sum(axis=2), 1e-20),
+        ])
+        combined = _masked_median(features, valid)
+        return self._frame_times(ring, start, hop, count), combined[:count], combined[count:]
+
+
+def make_doppler_engine(backend: str = DOPPLER_BACKEND, frame_size: int = DOPPLER_FRAMES) -> DopplerEngine:
+    """Build the Doppler engine named by `backend` (see DOPPLER_BACKEND)."""
+    if backend == "fft":
+        return DopplerEngine(frame_size=frame_size)
+    if backend == "sdft":
+        return SlidingDftBank(frame_size=frame_size)
+    raise ValueError(f"unknown Doppler backend: {backend}")
+
+
+doppler_engine = make_doppler_engine()
+
+
+def analyze_audio_block(block, ts: float):
+    """Update the level meter and Doppler score from one block of new samples."""
+    apply_audio_features(ts, _level_dbfs(block), *doppler_engine.process(audio_ring))
+
+
+def apply_audio_features(ts: float, level: float, times, scores, shifts):
+    """Fold one block's features (computed here or by the DSP worker) into state, history and baselines."""
+    global MIC_ERROR
+    snapshot = sensor_state.get()
+    if level <= -120.0:
+        if MIC_ERROR != "mic signal near zero":
+            print("WARNING: mic sampler saw near-zero audio; check input source/permissions")
+        MIC_ERROR = "mic signal near zero"
+    else:
+        MIC_ERROR = None
+    changes = {"mic_level": level}
+    mic_history.append(ts, level)
+    mic_frames.append((ts, level))
+    store_sample("mic", ts, level)
+    mic_active = snapshot.mic_baseline is not None and level >= snapshot.mic_baseline + snapshot.mic_threshold
+    with detector_lock:
+        mic_tracker.update(level, ts, frozen=mic_active or snapshot.rssi_detected)
+        if mic_tracker.ready:
+            changes["mic_baseline"] = round(mic_tracker.median, 1)
+
+    # Doppler-style motion metric from every overlapping STFT frame since the last block
+    for frame_ts, score, shift in zip(times, scores, shifts):
+        if math.isnan(score):
+            continue
+        doppler_score = round(float(score), 4)
+        doppler_shift_hz = round(float(shift), 1)
+        doppler_frames.append((frame_ts, doppler_score, doppler_shift_hz))
+        with detector_lock:
+            doppler_tracker.update(doppler_score, frame_ts, frozen=doppler_score >= DOPPLER_SCORE_THRESHOLD or snapshot.rssi_detected)
+        doppler_history.append(frame_ts, doppler_score)
+        store_sample("doppler", frame_ts, doppler_score)
+        changes["doppler_score"] = doppler_score
+        changes["doppler_shift_hz"] = doppler_shift_hz
+    with detector_lock:
+        event_id = decide_presence(ts, sensor_state.get(), changes)
+    if event_id is not False:
+        take_photo(event_id)
+
+
+def mic_sampler_loop():
+    global MIC_ERROR
+    cursor = None
+    last_wake = None
+    while True:
+        if not MIC_AVAILABLE:
+            time.sleep(1)
+            continue
+        try:
+            ring = start_audio_capture()
+            if cursor is None:
+                cursor = ring.write_pos
+            if not ring.wait(1.0):
+                sensor_state.publish(mic_level=None)
+                MIC_ERROR = "mic returned no data"
+                continue
+            now = time.monotonic()
+            if last_wake is not None and audio_capture is not None:
+                expected = audio_capture.blocksize / ring.samplerate
+                loop_jitter_seconds.observe("mic", abs(now - last_wake - expected))
+            last_wake = now
+            overruns = ring.overruns
+            with stage_seconds.time("audio_block_read"):
+                block, cursor = ring.read_since(cursor)
+            if ring.overruns != overruns:
+                events_total.inc("audio_overrun")
+            if len(block):
+                events_total.inc("audio_block")
+                if trace_writer is not None:
+                    trace_writer.audio(ring.last_ts, ring.samplerate, block)
+                with stage_seconds.time("feature_extraction"):
+                    analyze_audio_block(block, ring.last_ts)
+        except Exception as exc:
+            MIC_ERROR = str(exc)
+            events_total.inc("mic_error")
+            print(f"ERROR: mic sampler loop failed: {exc}")
+            stop_audio_capture()
+            cursor = None
+            time.sleep(1)
+
+
+def dsp_worker_main(ring_name: str, capacity: int, samplerate: int, features, stop, device=None,
+                    capture: bool = True, frame_size: int = DOPPLER_FRAMES):
+    """
+    Entry point of the DSP worker process. Captures audio into the shared ring
+    (unless `capture` is False and someone else writes it), and for every new
+    block puts one compact feature frame on `features`:
+    ("frame", ts, level, times, scores, shifts, dropped) or ("error", message).
+    """
+    ring = SharedAudioRing(capacity, samplerate, name=ring_name)
+    engine = make_doppler_engine(frame_size=frame_size)
+    stream = AudioCapture(ring, device=device) if capture else None
+    cursor = ring.write_pos
+    dropped = 0
+    try:
+        if stream is not None:
+            stream.start()
+        while not stop.is_set():
+            if not ring.wait(1.0):
+                if stream is not None:
+                    features.put(("error", "mic returned no data"))
+                continue
+            block, cursor = ring.read_since(cursor)
+            if not len(block):
+                continue
+            level = _level_dbfs(block)
+            times, scores, shifts = engine.process(ring)
+            frame = ("frame", ring.last_ts, level, list(times), np.asarray(scores).tolist(), np.asarray(shifts).tolist(), dropped)
+            try:
+                features.put_nowait(frame)
+            except queue.Full:
+                dropped += 1  # the web process is behind; it only needs the latest features
+    except Exception as exc:
+        features.put(("error", f"DSP worker failed: {exc}"))
+    finally:
+        if stream is not None:
+            stream.close()
+        ring.close()
+
+
+class DspProcess:
+    """A DSP worker process plus the shared ring and feature queue that connect it to this one."""
+
+    def __init__(self, samplerate: int, device=None, capture: bool = True, frame_size: int = DOPPLER_FRAMES):
+        context = multiprocessing.get_context("spawn")  # never fork a process that is running threads
+        self.ring = SharedAudioRing(int(AUDIO_RING_SECONDS * samplerate), samplerate)
+        self.features = context.Queue(maxsize=256)
+        self.stop = context.Event()
+        self.process = context.Process(
+            target=dsp_worker_main,
+            args=(self.ring.name, self.ring.capacity, samplerate, self.features, self.stop, device, capture, frame_size),
+            name="beam-dsp",
+            daemon=True,
+        )
+        self.frames = 0
+        self.dropped = 0
+
+    def start(self):
+        self.process.start()
+        print(f"INFO: DSP worker started (pid {self.process.pid})")
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def get(self, timeout: float):
+        """Next feature frame or error tuple, or None on timeout."""
+        try:
+            item = self.features.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item[0] == "frame":
+            self.frames += 1
+            self.dropped = item[6]
+        return item
+
+    def close(self):
+        self.stop.set()
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.features.close()
+        self.ring.close()
+
+
+def dsp_feature_loop():
+    """DSP_WORKER=process: keep the worker running and apply the features it sends back."""
+    global dsp_process, audio_ring, MIC_ERROR
+    cursor = None
+    while True:
+        if not MIC_AVAILABLE:
+            time.sleep(1)
+            continue
+        try:
+            if dsp_process is None or not dsp_process.alive():
+                if dsp_process is not None:
+                    events_total.inc("dsp_restart")
+                    dsp_process.close()
+                device = sd.default.device[0] if isinstance(sd.default.device, (list, tuple)) else sd.default.device
+                dsp_process = DspProcess(int(sd.default.samplerate or MIC_SAMPLERATE), device=device)
+                dsp_process.start()
+                audio_ring = dsp_process.ring
+                cursor = None
+            item = dsp_process.get(timeout=2.0)
+            if item is None:
+                sensor_state.publish(mic_level=None)
+                MIC_ERROR = "DSP worker sent no features"
+                continue
+            if item[0] == "error":
+                MIC_ERROR = item[1]
+                events_total.inc("mic_error")
+                continue
+            _, ts, level, times, scores, shifts, _ = item
+            events_total.inc("audio_block")
+            with stage_seconds.time("feature_apply"):
+                apply_audio_features(ts, level, times, scores, shifts)
+            if trace_writer is not None:
+                # Raw audio for the trace comes straight out of the shared ring
+                if cursor is None:
+                    cursor = audio_ring.write_pos
+                block, cursor = audio_ring.read_since(cursor)
+                if len(block):
+                    trace_writer.audio(audio_ring.last_ts, audio_ring.samplerate, block)
+        except Exception as exc:
+            MIC_ERROR = str(exc)
+            events_total.inc("mic_error")
+            print(f"ERROR: DSP feature loop failed: {exc}")
+            time.sleep(1)
+
+
+def _parse_weights(spec: str) -> dict:
+    weights = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip():
+            weights[name.strip()] = float(value)
+    return weights
+
+
+FUSION_WEIGHTS = _parse_weights(os.environ.get("FUSION_WEIGHTS", "rssi=1,mic=0.5,doppler=1"))
+FUSION_PRIOR = float(os.environ.get("FUSION_PRIOR", 0.05))  # prior probability someone is present
+FUSION_THRESHOLD = float(os.environ.get("FUSION_THRESHOLD", 0.5))
+FUSION_WINDOW = 2.0  # seconds of aligned history evaluated per call
+FUSION_SMOOTH = 0.3  # decision uses the mean log-odds over this trailing span
+FUSION_LLR_CLIP = (-1.0, 6.0)  # a quiet sensor can weaken, but not veto, a strong one
+
+
+class FusionEngine:
+    """
+    Combines RSSI, mic level and Doppler score into one presence probability.
+
+    Each sensor's raw stream is resampled (sample-and-hold) onto the timestamps
+    of the fastest stream in the last `window` seconds, normalized against its
+    own adaptive baseline (robust sigma), and turned into the log-likelihood
+    ratio of a mean shift of the sensor's detection threshold versus no shift.
+    The weighted, clipped LLRs plus the prior log-odds give the fused log-odds
+    at every grid point; all of it is vectorized with numpy.
+    """
+
+    def __init__(self, weights: dict = None, prior: float = FUSION_PRIOR, threshold: float = FUSION_THRESHOLD,
+                 window: float = FUSION_WINDOW, smooth: float = FUSION_SMOOTH):
+        self.weights = dict(FUSION_WEIGHTS if weights is None else weights)
+        self.prior = prior
+        self.threshold = threshold
+        self.window = window
+        self.smooth = smooth
+        self.last = None
+
+    def sensors(self, snapshot: SensorState):
+        """(name, recent (ts, value) frames, tracker, sign, expected shift) for each sensor."""
+        doppler_shift = None
+        if doppler_tracker.ready:
+            doppler_shift = max(DOPPLER_SCORE_THRESHOLD - doppler_tracker.median, 1.4826 * doppler_tracker.mad)
+        return (
+            ("rssi", rssi_frames, rssi_tracker, -1.0, snapshot.threshold),
+            ("mic", mic_frames, mic_tracker, 1.0, snapshot.mic_threshold),
+            ("doppler", doppler_frames, doppler_tracker, 1.0, doppler_shift),
+        )
+
+    def evaluate(self, now: float = None, snapshot: SensorState = None) -> dict:
+        if load_numpy() is None:
+            return None
+        if now is None:
+            now = time.time()
+        streams = []
+        for name, frames, tracker, sign, shift in self.sensors(snapshot or sensor_state.get()):
+            if not tracker.ready or not shift or not self.weights.get(name):
+                continue
+            # Runs per audio block: convert only the window plus one held sample before it
+            frames = list(frames)
+            first = max(bisect.bisect_left(frames, now - self.window, key=lambda f: f[0]) - 1, 0)
+            frames = [f[:2] for f in frames[first:] if f[1] is not None]
+            if not frames:
+                continue
+            data = np.asarray(frames, dtype=np.float64)
+            data = data[data[:, 0] >= now - self.window - 10.0]
+            if data.shape[0] == 0:
+                continue
+            streams.append((name, data, tracker, sign, shift))
+        if not streams:
+            self.last = None
+            return None
+
+        # Common timeline: the fastest stream's own timestamps inside the window
+        in_window = [s[1][s[1][:, 0] >= now - self.window, 0] for s in streams]
+        grid = max(in_window, key=len)
+        if grid.size == 0:
+            self.last = None
+            return None
+
+        logit = np.full(grid.size, math.log(self.prior / (1 - self.prior)))
+        contributions = {}
+        for name, data, tracker, sign, shift in streams:
+            ts, values = data[:, 0], data[:, 1]
+            period = float(np.median(np.diff(ts))) if ts.size > 1 else 1.0
+            idx = np.searchsorted(ts, grid, side="right") - 1
+            held = idx >= 0
+            idx = np.clip(idx, 0, None)
+            fresh = held & (grid - ts[idx] <= max(1.0, 3 * period))
+            sigma = 1.4826 * tracker.mad
+            z = sign * (values[idx] - tracker.median) / sigma
+            delta = shift / sigma
+            llr = np.clip(delta * z - delta * delta / 2, *FUSION_LLR_CLIP)
+            llr = np.where(fresh, self.weights[name] * llr, 0.0)
+            logit += llr
+            contributions[name] = round(float(llr[-1]), 3)
+
+        recent = logit[grid >= grid[-1] - self.smooth]
+        score = float(recent.mean())
+        probability = 1.0 / (1.0 + math.exp(-min(max(score, -50.0), 50.0)))
+        self.last = {
+            "probability": round(probability, 4),
+            "log_odds": round(score, 3),
+            "detected": probability >= self.threshold,
+            "contributions": contributions,
+            "points": int(grid.size),
+            "rate_hz": round((grid.size - 1) / (grid[-1] - grid[0]), 1) if grid.size > 1 and grid[-1] > grid[0] else None,
+        }
+        return self.last
+
+
+fusion = FusionEngine()
+
+
+class TraceWriter:
+    """
+    Append-only sensor trace for later replay. After an 8-byte magic, each
+    record is a "<cdI" header (kind, timestamp, payload length) plus payload:
+    kind b"R" carries "<dd" rssi/noise (NaN = missing), kind b"A" carries a
+    "<I" samplerate followed by little-endian float32 audio samples.
+    """
+
+    MAGIC = b"BEAMTRC1"
+    RECORD = struct.Struct("<cdI")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(self.MAGIC)
+
+    def _write(self, kind: bytes, ts: float, payload: bytes):
+        with self._lock:
+            self._file.write(self.RECORD.pack(kind, ts, len(payload)) + payload)
+
+    def rssi(self, ts: float, rssi, noise):
+        nan = float("nan")
+        self._write(b"R", ts, struct.pack("<dd", nan if rssi is None else rssi, nan if noise is None else noise))
+
+    def audio(self, ts: float, samplerate: int, block):
+        self._write(b"A", ts, struct.pack("<I", samplerate) + np.asarray(block, dtype="<f4").tobytes())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_trace(path: str):
+    """Yield ("rssi", ts, rssi, noise) and ("audio", ts, samplerate, samples) records in file order."""
+    with open(path, "rb") as f:
+        if f.read(len(TraceWriter.MAGIC)) != TraceWriter.MAGIC:
+            raise ValueError(f"not a beam trace: {path}")
+        while True:
+            head = f.read(TraceWriter.RECORD.size)
+            if len(head) < TraceWriter.RECORD.size:
+                return
+            kind, ts, length = TraceWriter.RECORD.unpack(head)
+            payload = f.read(length)
+            if len(payload) < length:
+                return  # truncated tail from an interrupted recording
+            if kind == b"R":
+                rssi, noise = struct.unpack("<dd", payload)
+                yield "rssi", ts, (None if rssi != rssi else int(rssi)), (None if noise != noise else int(noise))
+            elif kind == b"A":
+                (samplerate,) = struct.unpack_from("<I", payload)
+                yield "audio", ts, samplerate, np.frombuffer(payload, dtype="<f4", offset=4)
+
+
+class TraceReplay:
+    """
+    Feed a recorded trace through the live pipelines on one thread, in file
+    order and with the original timestamps, so runs are deterministic.
+    `speed` scales the pacing (1 = real time, N = N times faster, 0 = unpaced).
+    With `loop`, each repeat is shifted to start one record spacing after the
+    previous pass ended, so timestamps keep increasing.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.records = 0
+        self.finished = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, daemon=True)
+            self._thread.start()
+
+    def _feed_audio(self, ts: float, samplerate: int, samples):
+        global audio_ring
+        if audio_ring is None or audio_ring.samplerate != samplerate:
+            audio_ring = AudioRing(int(AUDIO_RING_SECONDS * samplerate), samplerate)
+        audio_ring.write(samples, ts)
+        analyze_audio_block(audio_ring.latest(len(samples)), ts)
+
+    def run(self):
+        offset = 0.0
+        while True:
+            wall_start = time.monotonic()
+            trace_start = trace_end = None
+            passed = 0
+            for record in read_trace(self.path):
+                kind, ts = record[0], record[1]
+                if trace_start is None:
+                    trace_start = ts
+                if self.speed > 0:
+                    delay = wall_start + (ts - trace_start) / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                trace_end = ts
+                passed += 1
+                ts += offset
+                try:
+                    if kind == "rssi":
+                        process_rssi_sample(ts, record[2], record[3])
+                    elif np is not None:
+                        self._feed_audio(ts, record[2], record[3])
+                except Exception as exc:
+                    print(f"ERROR: trace replay failed on {kind} record: {exc}")
+                self.records += 1
+            if not self.loop or trace_start is None:
+                break
+            span = trace_end - trace_start
+            offset += span + (span / (passed - 1) if passed > 1 else 1.0)
+        self.finished = True
+        print(f"INFO: trace replay finished after {self.records} records")
+
+    def status(self) -> dict:
+        return {"path": self.path, "speed": self.speed, "records": self.records, "finished": self.finished}
+
+
+def warm_camera():
+    camera = photo_worker.camera
+    with camera.lock:  # a detection may already be capturing; never open the device twice
+        camera.warm()
+
+
+class StartupTasks:
+    """Slow start-up work (imports, device discovery, camera warm-up) on background threads, reported by /health."""
+
+    def __init__(self):
+        self.tasks = {}
+        self._lock = threading.Lock()
+
+    def run(self, name: str, fn):
+        with self._lock:
+            self.tasks[name] = {"state": "running", "seconds": None, "error": None}
+
+        def target():
+            started = time.monotonic()
+            state, error = "ready", None
+            try:
+                fn()
+            except Exception as exc:
+                state, error = "failed", str(exc)
+                print(f"WARNING: start-up task {name} failed: {exc}")
+            with self._lock:
+                self.tasks[name] = {"state": state, "seconds": round(time.monotonic() - started, 3), "error": error}
+
+        threading.Thread(target=target, name=f"startup-{name}", daemon=True).start()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {name: dict(task) for name, task in self.tasks.items()}
+
+    @property
+    def done(self) -> bool:
+        with self._lock:
+            return all(task["state"] != "running" for task in self.tasks.values())
+
+
+startup_tasks = StartupTasks()
+serving_since = None  # when start-up handlers finished and requests began to be served
+
+
+def discover_microphone():
+    """Import numpy/sounddevice, pick an input device, then start the mic loop."""
+    global MIC_AVAILABLE, MIC_ERROR
+    if load_numpy() is None:
+        MIC_ERROR = "numpy not available"
+    elif load_sounddevice() is not None:
+        MIC_AVAILABLE, MIC_ERROR = True, None
+        init_microphone()
+    if not MIC_AVAILABLE:
+        print(f"INFO: microphone sampling disabled - {MIC_ERROR}")
+        return
+    target = dsp_feature_loop if DSP_WORKER == "process" else mic_sampler_loop
+    threading.Thread(target=target, daemon=True).start()
+
+
+def restore_history():
+    """Refill the live chart window from the persistent store after a restart."""
+    if series_store is None:
+        return
+    now = time.time()
+    for name, series in (("rssi", history), ("mic", mic_history), ("doppler", doppler_history)):
+        try:
+            for ts, value in series_store.query(name, now - 600, now):
+                series.append(ts, value)
+        except Exception as exc:
+            print(f"WARNING: failed to restore {name} history: {exc}")
+
+
+def start_trace_replay(path: str):
+    """Replace the hardware samplers with a replay of a recorded trace."""
+    global trace_replay, MIC_AVAILABLE, MIC_ERROR
+    if load_numpy() is not None:
+        MIC_AVAILABLE, MIC_ERROR = True, None
+    trace_replay = TraceReplay(path, speed=TRACE_SPEED, loop=TRACE_LOOP)
+    trace_replay.start()
+    print(f"INFO: replaying sensor trace {path} at {TRACE_SPEED:g}x")
+
+
+INGEST_MAX_LINKS = int(os.environ.get("INGEST_MAX_LINKS", 1000))
+INGEST_MAX_SKEW = float(os.environ.get("INGEST_MAX_SKEW", 5.0))  # re-stamp batches whose clock is further off
+INGEST_UDP_PORT = int(os.environ.get("INGEST_UDP_PORT", 0))  # 0 = UDP ingest disabled
+LINK_STALE_AFTER = 10.0  # seconds without samples before a link counts as inactive
+
+
+def _valid_link_id(link_id) -> bool:
+    return isinstance(link_id, str) and 0 < len(link_id) <= 64 and all(c.isalnum() or c in "-_.:" for c in link_id)
+
+
+def _parse_ingest_sample(sample):
+    """[ts, rssi, noise?, mic?] or {"t", "rssi", "noise", "mic"} -> floats (None where missing)."""
+    if isinstance(sample, dict):
+        values = (sample.get("t"), sample.get("rssi"), sample.get("noise"), sample.get("mic"))
+    else:
+        values = tuple(sample[:4]) + (None,) * (4 - len(sample[:4]))
+    parsed = tuple(None if v is None else float(v) for v in values)
+    if not all(v is None or math.isfinite(v) for v in parsed):
+        raise ValueError("non-finite value")
+    return parsed
+
+
+class Link:
+    """Baseline, history and detection state for one remote sensing link."""
+
+    def __init__(self, link_id: str):
+        self.id = link_id
+        self.tracker = AdaptiveBaseline(min_spread=0.5, auto_calibrate=True)
+        self.mic_tracker = AdaptiveBaseline(min_spread=0.5, auto_calibrate=True)
+        self.history = SampleSeries("rssi", maxlen=600, min_interval=HISTORY_INTERVAL, shared_seq=False)
+        self.debounce = Debouncer()
+        self.rssi = None
+        self.noise = None
+        self.mic = None
+        self.last_ts = None
+        self.last_seen = None
+        self.peer = None
+        self.detected = False
+        self.detections = 0
+        self.samples = 0
+        self.rejected = 0
+        self.restamped = 0
+
+    def add(self, ts: float, rssi, noise=None, mic=None) -> bool:
+        if self.last_ts is not None and ts <= self.last_ts:
+            self.rejected += 1  # duplicate or reordered (UDP)
+            return False
+        self.last_ts = ts
+        self.samples += 1
+        self.noise = noise
+        if mic is not None:
+            self.mic = mic
+            self.mic_tracker.update(mic, ts, frozen=self.detected)
+        if rssi is None:
+            return True
+        self.rssi = rssi
+        self.history.append(ts, rssi)
+        detected = False
+        if self.tracker.ready:
+            limit = self.tracker.median - sensor_state.get().threshold
+            if self.debounce.state:
+                limit += DETECTION_HYSTERESIS_DB
+            detected = self.debounce.update(rssi <= limit, ts)
+        if detected and not self.detected:
+            self.detections += 1
+            events_total.inc("link_detection")
+        self.detected = detected
+        self.tracker.update(rssi, ts, frozen=detected)
+        return True
+
+    def ingest(self, samples, now: float) -> int:
+        parsed = []
+        for sample in samples:
+            try:
+                parsed.append(_parse_ingest_sample(sample))
+            except (TypeError, ValueError, IndexError):
+                self.rejected += 1
+        if not parsed:
+            return 0
+        # Agents' clocks are trusted unless the batch is clearly off; then shift it as a whole
+        newest = max((p[0] for p in parsed if p[0] is not None), default=None)
+        shift = 0.0
+        if newest is None or abs(now - newest) > INGEST_MAX_SKEW:
+            shift = now - (newest if newest is not None else now)
+            self.restamped += len(parsed)
+        accepted = 0
+        for ts, rssi, noise, mic in parsed:
+            accepted += self.add((now if ts is None else ts) + shift, rssi, noise, mic)
+        self.last_seen = now
+        return accepted
+
+    def status(self, now: float = None) -> dict:
+        now = time.time() if now is None else now
+        return {
+            "id": self.id,
+            "rssi": self.rssi,
+            "noise": self.noise,
+            "mic": self.mic,
+            "baseline": round(self.tracker.median, 1) if self.tracker.ready else None,
+            "detected": self.detected,
+            "detections": self.detections,
+            "samples": self.samples,
+            "rejected": self.rejected,
+            "restamped": self.restamped,
+            "age": round(now - self.last_seen, 1) if self.last_seen is not None else None,
+            "active": self.last_seen is not None and now - self.last_seen <= LINK_STALE_AFTER,
+            "peer": self.peer,
+        }
+
+
+class LinkRegistry:
+    """
+    All remote links, keyed by the agent-supplied link ID. Ingest arrives on
+    the event loop and, for batches forwarded by viewer workers, on executor
+    threads; `_lock` serializes it so links, their trackers and the counters
+    see one batch at a time.
+    """
+
+    def __init__(self, max_links: int = INGEST_MAX_LINKS):
+        self.max_links = max_links
+        self.links = {}
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def get(self, link_id, now: float):
+        link = self.links.get(link_id)
+        if link is not None or not _valid_link_id(link_id):
+            return link
+        if len(self.links) >= self.max_links:
+            # Make room by forgetting the longest-silent link, if it has gone quiet
+            oldest = min(self.links.values(), key=lambda l: l.last_seen or 0.0)
+            if oldest.last_seen is not None and now - oldest.last_seen <= LINK_STALE_AFTER:
+                return None
+            del self.links[oldest.id]
+        link = self.links[link_id] = Link(link_id)
+        print(f"INFO: new sensing link {link_id}")
+        return link
+
+    def ingest(self, message, peer: str = None) -> int:
+        """Apply one ingest message: {"link", "samples"} or a list of them. Returns samples accepted."""
+        accepted = 0
+        with self._lock, stage_seconds.time("ingest"):
+            now = time.time()
+            for batch in message if isinstance(message, list) else [message]:
+                if not isinstance(batch, dict):
+                    self.rejected += 1
+                    continue
+                samples = batch.get("samples")
+                if samples is None and "rssi" in batch:
+                    samples = [batch]
+                link = self.get(batch.get("link"), now)
+                if link is None or not isinstance(samples, list):
+                    self.rejected += len(samples) if isinstance(samples, list) else 1
+                    continue
+                link.peer = peer
+                accepted += link.ingest(samples, now)
+        events_total.inc("ingest_sample", accepted)
+        return accepted
+
+    def reject(self, count: int = 1):
+        with self._lock:
+            self.rejected += count
+
+    def summary(self) -> dict:
+        now = time.time()
+        links = list(self.links.values())
+        return {
+            "count": len(links),
+            "active": sum(1 for l in links if l.last_seen is not None and now - l.last_seen <= LINK_STALE_AFTER),
+            "detected": sorted(l.id for l in links if l.detected)[:50],
+        }
+
+
+link_registry = LinkRegistry()
+
+
+class IngestDatagramProtocol(asyncio.DatagramProtocol):
+    """One JSON ingest message per datagram; no replies."""
+
+    def datagram_received(self, data, addr):
+        try:
+            message = json.loads(data)
+        except ValueError:
+            link_registry.reject()
+            return
+        link_registry.ingest(message, peer=addr[0])
+
+
+# Multi-worker deployment: with BEAM_DEPLOYMENT=shared, `uvicorn --workers N` elects one
+# sensor owner (flock on BEAM_OWNER_LOCK). It alone samples, detects and takes photos, and
+# streams its state over a Unix socket. The other workers mirror that stream to serve
+# /metrics and /ws and forward control requests to the owner.
+BEAM_DEPLOYMENT = os.environ.get("BEAM_DEPLOYMENT", "single")  # single | shared
+OWNER_LOCK_PATH = Path(os.environ.get("BEAM_OWNER_LOCK", str(DATA_DIR / "owner.lock")))
+STATE_SOCKET_PATH = os.environ.get("BEAM_STATE_SOCKET", str(DATA_DIR / "state.sock"))
+STATE_PUBLISH_INTERVAL = 0.1  # seconds between owner -> viewer deltas
+ROLE = "single"  # single | owner | viewer
+OWNER_COMMANDS = {}  # endpoint name -> function, run on the owner for viewers
+_owner_lock_file = None
+
+
+def try_become_owner() -> bool:
+    """Take the owner lock without blocking; it is held until this process exits."""
+    global _owner_lock_file
+    OWNER_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    lock_file = open(OWNER_LOCK_PATH, "a+")
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    _owner_lock_file = lock_file
+    return True
+
+
+def owner_only(fn):
+    """Endpoint that changes or reads owner-side state; viewer workers forward the call to the owner."""
+    OWNER_COMMANDS[fn.__name__] = fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if ROLE == "viewer":
+            # FastAPI passes every parameter by name, so kwargs is the whole call
+            return state_mirror.call_sync(fn.__name__, **kwargs)
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def _state_message(kind: str, cursor: int) -> dict:
+    with history_lock:
+        return {
+            "type": kind,
+            "epoch": STREAM_EPOCH,
+            "seq": _last_seq,
+            "scalars": build_scalar_metrics(),
+            "series": {name: series.items_since(cursor) for name, series in STREAM_SERIES},
+            "evicted": {name: series.evicted_seq for name, series in STREAM_SERIES},
+        }
+
+
+class StatePublisher:
+    """Owner side: streams scalars and new history samples to viewers, and runs their commands."""
+
+    MAX_BACKLOG = 4 << 20  # bytes queued for one viewer before it is dropped
+
+    def __init__(self, path: str):
+        self.path = path
+        self.writers = set()
+        self.cursor = 0
+        self.last_scalars = None
+        # The loop only holds weak references to servers and tasks; keep them alive here
+        self.server = None
+        self.task = None
+        self.commands = set()
+
+    async def start(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)  # left behind by a previous owner
+        self.server = await asyncio.start_unix_server(self._serve, path=self.path)
+        self.task = asyncio.create_task(self._run())
+        print(f"INFO: sensor owner (pid {os.getpid()}) publishing state on {self.path}")
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        for writer in list(self.writers):
+            writer.close()
+        self.writers.clear()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(STATE_PUBLISH_INTERVAL)
+            if not self.writers:
+                self.cursor = _last_seq
+                continue
+            message = _state_message("delta", self.cursor)
+            if message["seq"] == self.cursor and message["scalars"] == self.last_scalars:
+                continue
+            self.cursor = message["seq"]
+            self.last_scalars = message["scalars"]
+            line = (json.dumps(message) + "\n").encode()
+            for writer in list(self.writers):
+                if writer.transport.get_write_buffer_size() > self.MAX_BACKLOG:
+                    self.writers.discard(writer)
+                    writer.close()
+                    continue
+                writer.write(line)
+
+    async def _serve(self, reader, writer):
+        # Snapshot first; later deltas may overlap it, viewers skip seqs they already hold
+        writer.write((json.dumps(_state_message("snapshot", 0)) + "\n").encode())
+        self.writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self._command(writer, json.loads(line)))
+                self.commands.add(task)
+                task.add_done_callback(self.commands.discard)
+        except Exception as exc:
+            print(f"WARNING: viewer connection failed: {exc}")
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def _command(self, writer, request: dict):
+        fn = OWNER_COMMANDS.get(request.get("cmd"))
+        args = request.get("args") or {}
+        try:
+            if fn is None:
+                result = {"error": "unknown command"}
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, **args))
+        except Exception as exc:
+            result = {"error": str(exc)}
+        writer.write((json.dumps({"type": "reply", "id": request.get("id"), "result": result}) + "\n").encode())
+
+
+class StateMirror:
+    """Viewer side: follows the owner's state stream and forwards commands to it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.scalars = None
+        self.loop = None
+        self.task = None
+        self._writer = None
+        self._pending = {}
+        self._next_id = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=1 << 24)
+            except OSError:
+                # No owner listening: either it is still starting, or it died and the lock is free
+                if try_become_owner():
+                    await promote_to_owner()
+                    return
+                await asyncio.sleep(0.5)
+                continue
+            self._writer = writer
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    self._apply(json.loads(line))
+            except Exception as exc:
+                print(f"WARNING: state stream failed: {exc}")
+            finally:
+                self._writer = None
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_result({"error": "sensor owner went away"})
+                writer.close()
+            print("WARNING: lost the sensor owner; re-electing")
+
+    def _apply(self, message: dict):
+        global _last_seq, STREAM_EPOCH
+        if message["type"] == "reply":
+            future = self._pending.get(message["id"])
+            if future is not None and not future.done():
+                future.set_result(message["result"])
+            return
+        snapshot = message["type"] == "snapshot"
+        with history_lock:
+            for name, series in STREAM_SERIES:
+                series.mirror(message["series"].get(name, ()), message["evicted"].get(name) if snapshot else None)
+            _last_seq = message["seq"]
+            STREAM_EPOCH = message["epoch"]
+            self.scalars = message["scalars"]
+        seq_waiters.notify()
+        scalars = self.scalars
+        # Keep the local snapshot in step so endpoints that read it (e.g. /photo) work here too
+        sensor_state.publish(
+            rssi=scalars.get("rssi"),
+            baseline=scalars.get("baseline"),
+            detected=scalars.get("detected", False),
+            rssi_detected=scalars.get("rssi_detected", False),
+            fusion=scalars.get("fusion"),
+            mode=scalars.get("mode", "air"),
+            threshold=scalars.get("threshold", 6),
+            mic_level=scalars.get("mic_level"),
+            mic_baseline=scalars.get("mic_baseline"),
+            mic_threshold=scalars.get("mic_threshold", 6),
+            doppler_score=scalars.get("doppler_score"),
+            doppler_shift_hz=scalars.get("doppler_shift_hz"),
+            last_photo=scalars.get("last_photo"),
+        )
+
+    async def call(self, cmd: str, **args):
+        if self._writer is None:
+            return {"error": "sensor owner unavailable"}
+        self._next_id += 1
+        request_id = self._next_id
+        future = self._pending[request_id] = self.loop.create_future()
+        self._writer.write((json.dumps({"id": request_id, "cmd": cmd, "args": args}) + "\n").encode())
+        try:
+            return await asyncio.wait_for(future, timeout=10)
+        except asyncio.TimeoutError:
+            return {"error": "sensor owner timed out"}
+        finally:
+            self._pending.pop(request_id, None)
+
+    def call_sync(self, cmd: str, **args):
+        """`call` from a threadpool endpoint."""
+        if self.loop is None:
+            return {"error": "sensor owner unavailable"}
+        return asyncio.run_coroutine_threadsafe(self.call(cmd, **args), self.loop).result(timeout=15)
+
+
+state_publisher = StatePublisher(STATE_SOCKET_PATH)
+state_mirror = StateMirror(STATE_SOCKET_PATH)
+OWNER_COMMANDS["ingest"] = lambda message, peer=None: {"accepted": link_registry.ingest(message, peer=peer)}
+
+
+async def promote_to_owner():
+    """A viewer took over the lock after the owner died: start sensing and publishing here."""
+    global ROLE, STREAM_EPOCH
+    ROLE = "owner"
+    state_mirror.scalars = None
+    with history_lock:
+        STREAM_EPOCH = str(int(time.time() * 1000))  # clients resync onto this worker's history
+        for _, series in STREAM_SERIES:
+            series.mirror((), evicted_seq=_last_seq)
+    seq_waiters.notify()
+    print(f"INFO: worker {os.getpid()} promoted to sensor owner")
+    await asyncio.get_running_loop().run_in_executor(None, start_sampler)
+    await state_publisher.start()
+
+
+@app.on_event("startup")
+async def start_deployment():
+    global ROLE
+    if BEAM_DEPLOYMENT != "shared":
+        return
+    if try_become_owner():
+        ROLE = "owner"
+        await state_publisher.start()
+    else:
+        ROLE = "viewer"
+        state_mirror.start()
+        print(f"INFO: worker {os.getpid()} serving as viewer of the sensor owner")
+
+
+@app.on_event("startup")
+async def start_ingest_udp():
+    if not INGEST_UDP_PORT or ROLE == "viewer":
+        return
+    loop = asyncio.get_running_loop()
+    await loop.create_datagram_endpoint(IngestDatagramProtocol, local_addr=("0.0.0.0", INGEST_UDP_PORT))
+    print(f"INFO: UDP ingest listening on :{INGEST_UDP_PORT}")
+
+
+@app.on_event("startup")
+def start_sampler():
+    global trace_writer
+    if ROLE == "viewer":
+        return
+    load_baseline()
+    load_mic_baseline()
+    load_baseline_state()
+    restore_history()  # before the sampler runs, so restored samples stay in time order
+    photo_store.start()
+    photo_worker.start()
+    # Everything slow happens in the background; /health reports progress
+    startup_tasks.run("camera", warm_camera)
+    startup_tasks.run("photo_index", photo_store.load)
+    if TRACE_REPLAY:
+        startup_tasks.run("trace_replay", lambda: start_trace_replay(TRACE_REPLAY))
+        return
+    startup_tasks.run("numpy", load_numpy)
+    if TRACE_RECORD:
+        trace_writer = TraceWriter(TRACE_RECORD)
+        print(f"INFO: recording sensor trace to {TRACE_RECORD}")
+    thread = threading.Thread(target=sampler_loop, daemon=True)
+    thread.start()
+    startup_tasks.run("microphone", discover_microphone)
+
+
+@app.on_event("startup")
+def mark_serving():
+    global serving_since
+    serving_since = time.time()
+    print(f"INFO: serving {serving_since - STARTED_AT:.2f} s after import")
+
+
+@app.on_event("shutdown")
+async def stop_deployment():
+    await state_mirror.close()
+    await state_publisher.close()
+
+
+@app.on_event("shutdown")
+def stop_sampler():
+    if trace_writer is not None:
+        trace_writer.close()
+    if series_store is not None:
+        series_store.close()
+    if dsp_process is not None:
+        dsp_process.close()
+
+
+@app.post("/calibrate")
+@owner_only
+def calibrate():
+    resp = {}
+    with detector_lock:
+        snapshot = sensor_state.get()
+        # Seed from the median of the most recent samples rather than a single reading
+        if snapshot.rssi is None or not rssi_tracker.calibrate(window=CALIBRATION_WINDOW):
+            resp["error"] = "No RSSI yet"
+        else:
+            resp["baseline"] = round(rssi_tracker.median, 1)
+
+        if MIC_AVAILABLE and snapshot.mic_level is not None and mic_tracker.calibrate(window=CALIBRATION_WINDOW):
+            resp["mic_baseline"] = round(mic_tracker.median, 1)
+        elif MIC_AVAILABLE:
+            resp["mic_error"] = "Microphone not ready yet"
+
+        doppler_tracker.calibrate()
+        reset_detection()
+        sensor_state.publish(**{k: v for k, v in resp.items() if k in ("baseline", "mic_baseline")})
+    persist_baseline_state()
+    return resp
+
+
+@app.post("/threshold")
+@owner_only
+def set_threshold(value: int):
+    if value < 1:
+        value = 1
+    if value > 40:
+        value = 40
+    snapshot = sensor_state.publish_with(lambda s: {"threshold": value, "thresholds": {**s.thresholds, s.mode: value}})
+    return {"threshold": snapshot.threshold}
+
+
+@app.post("/detector")
+@owner_only
+def set_detector(hysteresis_db: float = None, min_dwell: float = None, cusum_h: float = None):
+    """Tune debouncing: threshold-mode release margin, minimum dwell, CUSUM alarm level."""
+    global DETECTION_HYSTERESIS_DB
+    with detector_lock:
+        if hysteresis_db is not None:
+            DETECTION_HYSTERESIS_DB = min(max(hysteresis_db, 0.0), 20.0)
+        if min_dwell is not None:
+            detection_debounce.min_dwell = min(max(min_dwell, 0.0), 10.0)
+        if cusum_h is not None:
+            cusum.h = min(max(cusum_h, 0.5), 50.0)
+    return {"hysteresis_db": DETECTION_HYSTERESIS_DB, "min_dwell": detection_debounce.min_dwell, "cusum_h": cusum.h}
+
+
+@app.post("/mode")
+@owner_only
+def set_mode(new_mode: str):
+    if new_mode not in ("air", "wall", "cusum"):
+        return {"error": "invalid mode"}
+    # Mode and its threshold change together, so no reader sees one without the other
+    with detector_lock:
+        snapshot = sensor_state.publish_with(lambda s: {"mode": new_mode, "threshold": s.thresholds.get(new_mode, s.threshold)})
+        reset_detection()
+    return {"mode": snapshot.mode, "threshold": snapshot.threshold}
+
+
+def build_scalar_metrics(snapshot: SensorState = None):
+    """Latest readings and detection state, without any history series, all from one state version."""
+    if ROLE == "viewer" and state_mirror.scalars is not None:
+        return dict(state_mirror.scalars)
+    if snapshot is None:
+        snapshot = sensor_state.get()
+    photo_url = None
+    if snapshot.last_photo:
+        # Content-hashed, so the browser can cache it forever
+        photo_url = f"/photos/{os.path.basename(snapshot.last_photo)}"
+
+    return {
+        "state_version": snapshot.version,
+        "rssi": snapshot.rssi,
+        "baseline": snapshot.baseline,
+        "mode": snapshot.mode,
+        "threshold": snapshot.threshold,
+        "rssi_detected": bool(snapshot.baseline is not None and snapshot.rssi_detected),
+        "detector": {
+            "kind": "cusum" if snapshot.mode == "cusum" else "threshold",
+            "hysteresis_db": DETECTION_HYSTERESIS_DB,
+            "min_dwell": detection_debounce.min_dwell,
+            "cusum_h": cusum.h,
+            "cusum_upper": round(cusum.upper, 2),
+            "cusum_lower": round(cusum.lower, 2),
+        },
+        "rssi_source": rssi_source.name if rssi_source is not None else None,
+        "rssi_rate_hz": RSSI_RATE_HZ,
+        "mic_level": snapshot.mic_level,
+        "mic_baseline": snapshot.mic_baseline,
+        "mic_threshold": snapshot.mic_threshold,
+        "mic_detected": mic_detected(snapshot),
+        "mic_available": MIC_AVAILABLE,
+        "mic_error": MIC_ERROR,
+        "detected": snapshot.detected,
+        "fusion": snapshot.fusion,
+        "photo_url": photo_url,
+        "photo_thumb_url": f"{photo_url}?size=thumb" if photo_url else None,
+        "doppler_score": snapshot.doppler_score,
+        "doppler_shift_hz": snapshot.doppler_shift_hz,
+        "doppler_detected": bool(snapshot.doppler_score is not None and snapshot.doppler_score >= DOPPLER_SCORE_THRESHOLD),
+        "last_photo": snapshot.last_photo,
+        "photo": {**photo_worker.status(), "store": photo_store.status()},
+        "baselines": {
+            "rssi": rssi_tracker.status(1),
+            "mic": mic_tracker.status(1),
+            "doppler": doppler_tracker.status(4),
+        },
+        "replay": trace_replay.status() if trace_replay is not None else None,
+        "links": link_registry.summary(),
+    }
+
+
+# Wire format for binary frames (all little-endian):
+#   "BEAM" | u8 version | 3 pad bytes | u32 header length | JSON header, padded to 8 bytes | arrays
+# The header holds every scalar field plus "arrays": [{"name", "key", "length", "t", "v"}],
+# where t/v are byte offsets (from the end of the padded header) of a float64 array of
+# epoch-ms timestamps and a float32 array of values. Offsets are 8-byte aligned so browsers
+# can wrap them directly in Float64Array/Float32Array.
+BINARY_MEDIA_TYPE = "application/x-beam-frame"
+BINARY_SUBPROTOCOL = "beam.bin.v1"
+JSON_SUBPROTOCOL = "beam.json.v1"
+_FRAME_PREFIX = struct.Struct("<4sBxxxI")
+
+
+def _pad8(n: int) -> int:
+    return (8 - n % 8) % 8
+
+
+def encode_binary_frame(frame: dict) -> bytes:
+    """Pack a metrics/stream frame's history lists as typed arrays behind a JSON header."""
+    header = {k: v for k, v in frame.items() if not k.endswith("history")}
+    arrays = []
+    blobs = []
+    offset = 0
+    for name, series in STREAM_SERIES:
+        points = frame.get(name)
+        if points is None:
+            continue
+        n = len(points)
+        ts = struct.pack(f"<{n}d", *(p["t"] for p in points))
+        values = struct.pack(f"<{n}f", *(float("nan") if p[series.key] is None else p[series.key] for p in points))
+        values += bytes(_pad8(len(values)))
+        arrays.append({"name": name, "key": series.key, "length": n, "t": offset, "v": offset + len(ts)})
+        blobs += [ts, values]
+        offset += len(ts) + len(values)
+    header["arrays"] = arrays
+    head = json.dumps(header).encode()
+    head += b" " * _pad8(_FRAME_PREFIX.size + len(head))
+    return b"".join([_FRAME_PREFIX.pack(b"BEAM", 1, len(head)), head, *blobs])
+
+
+def decode_binary_frame(data: bytes) -> dict:
+    """Inverse of encode_binary_frame, for Python clients and tooling."""
+    magic, version, head_len = _FRAME_PREFIX.unpack_from(data, 0)
+    if magic != b"BEAM" or version != 1:
+        raise ValueError("not a beam frame")
+    base = _FRAME_PREFIX.size + head_len
+    frame = json.loads(data[_FRAME_PREFIX.size:base])
+    for spec in frame.pop("arrays"):
+        n = spec["length"]
+        ts = struct.unpack_from(f"<{n}d", data, base + spec["t"])
+        values = struct.unpack_from(f"<{n}f", data, base + spec["v"])
+        frame[spec["name"]] = [{"t": int(t), spec["key"]: v} for t, v in zip(ts, values)]
+    return frame
+
 
+def encode_frame(frame: dict, fmt: str):
+    return encode_binary_frame(frame) if fmt == "binary" else json.dumps(frame)
 
-def load_baseline():
-    global baseline
-    if not BASELINE_PATH.exists():
-        return
-    try:
-        baseline = int(BASELINE_PATH.read_text().strip())
-    except Exception:
-        baseline = None
 
+def build_metrics_payload(cursor: int = 0, scalars: dict = None):
+    """Scalar metrics plus every history sample newer than the cursor."""
+    with history_lock:
+        payload = build_scalar_metrics() if scalars is None else dict(scalars)
+        payload["epoch"] = STREAM_EPOCH
+        payload["seq"] = _last_seq
+        for name, series in STREAM_SERIES:
+            payload[name] = series.points(cursor)
+    return payload
 
-def persist_baseline(value: int):
-    try:
-        BASELINE_PATH.write_text(str(value))
-    except Exception:
-        pass
 
+def build_stream_frame(cursor=None, epoch=None, scalars: dict = None):
+    """
+    Build a streaming frame for a client positioned at `cursor`.
 
-def load_mic_baseline():
-    """Load baseline microphone level if available."""
-    global mic_baseline
-    if not MIC_BASELINE_PATH.exists():
-        return
-    try:
-        mic_baseline = float(MIC_BASELINE_PATH.read_text().strip())
-    except Exception as exc:
-        print(f"WARNING: failed to load mic baseline: {exc}")
-        mic_baseline = None
+    Returns a full snapshot when the client has no cursor, comes from a previous
+    server run, or has fallen behind the retained window; otherwise a delta with
+    only the samples added since the cursor.
+    """
+    with history_lock:
+        stale = (
+            cursor is None
+            or epoch != STREAM_EPOCH
+            or cursor > _last_seq
+            or any(series.has_gap(cursor) for _, series in STREAM_SERIES)
+        )
+        if stale:
+            frame = build_metrics_payload(scalars=scalars)
+            frame["type"] = "snapshot"
+        else:
+            frame = build_metrics_payload(cursor, scalars=scalars)
+            frame["type"] = "delta"
+            frame["from"] = cursor
+    return frame
 
 
-def persist_mic_baseline(value: float):
-    """Persist microphone baseline level to disk."""
+def _parse_cursor(value):
     try:
-        MIC_BASELINE_PATH.write_text(str(value))
-    except Exception as exc:
-        print(f"WARNING: failed to persist mic baseline: {exc}")
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return None
 
 
-def take_photo():
-    global last_photo_path
+METRICS_MAX_WAIT = 30.0  # seconds a long-poll may block
 
-    os.makedirs("photos", exist_ok=True)
 
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"photos/capture_{ts}.jpg"
+# Fields left out of the /metrics validator: they move with every audio block or capture even when
+# no reading changed (state version, sample counts, fusion grid size, photo timings)
+ETAG_IGNORED = {
+    "state_version": True,
+    "fusion": ("points",),
+    "photo": ("last_capture_ms", "last_duration_ms"),
+    "baselines": {"rssi": ("samples",), "mic": ("samples",), "doppler": ("samples",)},
+}
 
-    try:
-        subprocess.run(["imagesnap", "-w", "0.8", filename], check=True)
-        last_photo_path = filename
-    except Exception as exc:
-        print(f"ERROR capturing photo: {exc}")
 
+def _without(value, ignored):
+    if ignored is True:
+        return None
+    if not isinstance(value, dict):
+        return value
+    if isinstance(ignored, tuple):
+        return {k: v for k, v in value.items() if k not in ignored}
+    return {k: _without(v, ignored[k]) if k in ignored else v for k, v in value.items()}
 
-def sampler_loop():
-    global latest_rssi, history, last_detected
-    while True:
-        try:
-            rssi, noise = read_rssi_wdutil()
-            latest_rssi = rssi
 
-            if rssi is not None:
-                history.append((time.time(), rssi))
+def metrics_etag(scalars: dict, fmt: str) -> str:
+    """Validator for one /metrics representation: the stream position plus a digest of the readings."""
+    content = _without(scalars, ETAG_IGNORED)
+    digest = hashlib.blake2b(json.dumps(content, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+    return f'"{STREAM_EPOCH}-{_last_seq}-{digest}-{fmt}"'
 
-            detected_now = False
-            if baseline is not None and rssi is not None:
-                detected_now = bool(rssi <= baseline - threshold)
 
-            if detected_now and not last_detected:
-                take_photo()
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
 
-            last_detected = detected_now
 
-        except Exception as exc:
-            print(f"ERROR: sampler loop failed: {exc}")
-        time.sleep(1)
+async def wait_for_samples(since: int, epoch: str, timeout: float):
+    """Return once the stream moves past `since` (or restarts with a new epoch), or after `timeout`."""
+    await seq_waiters.wait_until(lambda: _last_seq > since or epoch != STREAM_EPOCH, timeout)
 
 
-def mic_sampler_loop():
-    global latest_mic_level, mic_history, doppler_score, doppler_history, _doppler_prev_band, MIC_ERROR
-    init_microphone()
-    stream = None
+def _metrics_response(cursor, epoch, fmt: str, if_none_match: str):
+    with stage_seconds.time("payload_build"):
+        with history_lock:
+            scalars = build_scalar_metrics()
+            etag = metrics_etag(scalars, fmt)
+            if _etag_matches(etag, if_none_match):
+                events_total.inc("metrics_not_modified")
+                return Response(status_code=304, headers={"ETag": etag})
+            if cursor is None:
+                payload = build_metrics_payload(scalars=scalars)
+            else:
+                payload = build_stream_frame(_parse_cursor(cursor), epoch, scalars=scalars)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if fmt == "binary":
+        return Response(encode_binary_frame(payload), media_type=BINARY_MEDIA_TYPE, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+
+@app.get("/metrics")
+async def metrics(
+    request: Request,
+    cursor: str = None,
+    epoch: str = None,
+    format: str = None,
+    since: str = None,
+    wait: float = 0,
+):
+    """
+    Current metrics, or with `cursor`/`epoch` a stream frame (see build_stream_frame).
+    Responses carry an ETag; a matching If-None-Match gets 304. Long-poll with
+    `since=<seq>&wait=<s>`: blocks until samples newer than `since` exist, then
+    returns the delta from there.
+    """
+    if since is not None:
+        cursor = since
+        epoch = epoch or STREAM_EPOCH
+        since_seq = _parse_cursor(since)
+        if since_seq is not None and wait > 0:
+            await wait_for_samples(since_seq, epoch, min(wait, METRICS_MAX_WAIT))
+    fmt = "json"
+    if format == "binary" or (format is None and BINARY_MEDIA_TYPE in request.headers.get("accept", "")):
+        fmt = "binary"
+    return await run_in_threadpool(_metrics_response, cursor, epoch, fmt, request.headers.get("if-none-match"))
+
+
+async def _receive_cursor_updates(ws: WebSocket, client: dict):
+    """Apply cursor/resync requests sent by the client while frames stream out."""
     while True:
-        if not MIC_AVAILABLE:
-            time.sleep(1)
-            continue
         try:
-            frames = max(1, DOPPLER_FRAMES)
-            audio = sd.rec(
-                frames,
-                samplerate=DOPPLER_SAMPLERATE,
-                channels=1,
-                dtype="float32",
-            )
-            sd.wait()
-            if audio is None:
-                latest_mic_level = None
-            else:
-                audio = audio.flatten()
-                rms = float(np.sqrt(np.mean(np.square(audio))))
-                latest_mic_level = round(20 * np.log10(rms), 1) if rms > 0 else -120.0
-            if stream is None:
-                stream = sd.InputStream(
-                    device=sd.default.device[0] if isinstance(sd.default.device, (list, tuple)) else sd.default.device,
-                    channels=1,
-                    samplerate=sd.default.samplerate or MIC_SAMPLERATE,
-                    dtype="float32",
-                    blocksize=DOPPLER_FRAMES,
-                )
-                stream.start()
-
-            frames = max(1, DOPPLER_FRAMES)
-            audio, _ = stream.read(frames)
-            if audio is None:
-                latest_mic_level = None
-                MIC_ERROR = "mic returned no data"
-            else:
-                audio = audio.flatten()
-                rms = float(np.sqrt(np.mean(np.square(audio))))
-                if rms <= 1e-9:
-                    latest_mic_level = -120.0
-                    MIC_ERROR = "mic signal near zero"
-                    print("WARNING: mic sampler saw near-zero audio; check input source/permissions")
-                else:
-                    latest_mic_level = round(20 * np.log10(rms), 1)
-                    MIC_ERROR = None
-                mic_history.append((time.time(), latest_mic_level))
-
-                # Doppler-style motion metric: spectral change near carrier
-                spectrum = np.abs(np.fft.rfft(audio))
-                freqs = np.fft.rfftfreq(len(audio), 1 / DOPPLER_SAMPLERATE)
-                band_mask = (freqs >= DOPPLER_CARRIER_HZ - DOPPLER_BAND_HZ) & (
-                    freqs <= DOPPLER_CARRIER_HZ + DOPPLER_BAND_HZ
-                )
-                band = spectrum[band_mask]
-                if band.size:
-                    if _doppler_prev_band is not None and _doppler_prev_band.size == band.size:
-                        diff = np.mean(np.abs(band - _doppler_prev_band))
-                        doppler_score = round(float(diff), 4)
-                        doppler_history.append((time.time(), doppler_score))
-                    _doppler_prev_band = band
-        except Exception as exc:
-            MIC_ERROR = str(exc)
-            print(f"ERROR: mic sampler loop failed: {exc}")
-            if stream is not None:
-                try:
-                    stream.close()
-                except Exception:
-                    pass
-                stream = None
-        time.sleep(1)
-def warm_camera():
-    try:
-        os.makedirs("photos", exist_ok=True)
-        subprocess.run(["imagesnap", "-w", "1", "photos/warmup.jpg"], check=False)
-    except Exception:
-        pass
-    try:
-        os.remove("photos/warmup.jpg")
-    except Exception:
-        pass
+            message = await ws.receive_json()
+        except (ValueError, KeyError):
+            continue
+        if not isinstance(message, dict):
+            continue
+        if message.get("resync"):
+            client["cursor"] = None
+        elif "cursor" in message:
+            client["cursor"] = _parse_cursor(message.get("cursor"))
+            client["epoch"] = message.get("epoch", STREAM_EPOCH)
 
 
-@app.on_event("startup")
-def start_sampler():
-    load_baseline()
-    load_mic_baseline()
-    warm_camera()
-    thread = threading.Thread(target=sampler_loop, daemon=True)
-    thread.start()
-    if MIC_AVAILABLE:
-        mic_thread = threading.Thread(target=mic_sampler_loop, daemon=True)
-        mic_thread.start()
-    else:
-        print("INFO: microphone sampling disabled - sounddevice/numpy not available")
+def _frame_scalars(frame: dict):
+    return {k: v for k, v in frame.items() if not k.endswith("history") and k not in ("seq", "from", "type")}
 
 
-app.mount("/photos", StaticFiles(directory="photos"), name="photos")
+class HubFrame:
+    """One tick's delta frame, encoded at most once per wire format."""
 
+    __slots__ = ("start", "seq", "frame", "_encoded")
 
-@app.post("/calibrate")
-def calibrate():
-    global baseline, mic_baseline
-    resp = {}
+    def __init__(self, start: int, frame: dict):
+        self.start = start
+        self.seq = frame["seq"]
+        self.frame = frame
+        self._encoded = {}
 
-    if latest_rssi is None:
-        resp["error"] = "No RSSI yet"
-    else:
-        baseline = latest_rssi
-        persist_baseline(baseline)
-        resp["baseline"] = baseline
+    def encoded(self, fmt: str):
+        data = self._encoded.get(fmt)
+        if data is None:
+            with stage_seconds.time("payload_encode"):
+                data = self._encoded[fmt] = encode_frame(self.frame, fmt)
+        return data
 
-    if MIC_AVAILABLE and latest_mic_level is not None:
-        mic_baseline = latest_mic_level
-        persist_mic_baseline(mic_baseline)
-        resp["mic_baseline"] = mic_baseline
-    elif MIC_AVAILABLE:
-        resp["mic_error"] = "Microphone not ready yet"
 
-    return resp
+class BroadcastHub:
+    """
+    Single producer for /ws: builds one delta frame per tick, encodes it once
+    per wire format in use, and fans the same bytes out to every subscriber's
+    bounded queue.
+    """
 
+    def __init__(self, interval: float = 0.3, queue_size: int = 4):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._subscribers = set()
+        self._task = None
 
-@app.post("/threshold")
-def set_threshold(value: int):
-    global threshold, mode, thresholds
-    if value < 1:
-        value = 1
-    if value > 40:
-        value = 40
-    threshold = value
-    thresholds[mode] = value
-    return {"threshold": threshold}
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
 
+    def subscribe(self) -> asyncio.Queue:
+        client_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(client_queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return client_queue
 
-@app.post("/mode")
-def set_mode(new_mode: str):
-    global mode, threshold, thresholds
-    if new_mode not in ("air", "wall"):
-        return {"error": "invalid mode"}
-    mode = new_mode
-    if mode in thresholds:
-        threshold = thresholds[mode]
-    else:
-        thresholds[mode] = threshold
-    return {"mode": mode, "threshold": threshold}
+    def unsubscribe(self, client_queue: asyncio.Queue):
+        self._subscribers.discard(client_queue)
 
+    def _offer(self, client_queue: asyncio.Queue, item):
+        # Drop the oldest queued frame rather than block on a slow client; the
+        # sender notices the cursor gap and sends one catch-up frame instead.
+        while True:
+            try:
+                client_queue.put_nowait(item)
+                return
+            except asyncio.QueueFull:
+                try:
+                    client_queue.get_nowait()
+                    self.dropped += 1
+                    events_total.inc("ws_frame_dropped")
+                except asyncio.QueueEmpty:
+                    pass
 
-def build_metrics_payload():
-    global latest_rssi, baseline, threshold, mode, thresholds, history, last_photo_path
+    async def _run(self):
+        cursor = _last_seq
+        last_scalars = None
+        while self._subscribers:
+            with stage_seconds.time("payload_build"):
+                frame = build_stream_frame(cursor, STREAM_EPOCH)
+            scalars = _frame_scalars(frame)
+            if frame["seq"] != cursor or scalars != last_scalars:
+                item = HubFrame(cursor, frame)
+                for client_queue in list(self._subscribers):
+                    self._offer(client_queue, item)
+                cursor = frame["seq"]
+                last_scalars = scalars
+            await asyncio.sleep(self.interval)
 
-    rssi_detected = False
-    mic_detected = False
-    if latest_rssi is not None and baseline is not None:
-        rssi_detected = bool(latest_rssi <= baseline - threshold)
-    if MIC_AVAILABLE and latest_mic_level is not None and mic_baseline is not None:
-        mic_detected = bool(latest_mic_level >= mic_baseline + mic_threshold)
-    detected = rssi_detected or mic_detected
 
-    photo_url = None
-    if last_photo_path:
-        # Serve via /photos/<filename>
-        photo_url = f"/photos/{os.path.basename(last_photo_path)}"
+hub = BroadcastHub()
 
-    return {
-        "rssi": latest_rssi,
-        "baseline": baseline,
-        "mode": mode,
-        "threshold": threshold,
-        "rssi_detected": rssi_detected,
-        "mic_level": latest_mic_level,
-        "mic_baseline": mic_baseline,
-        "mic_threshold": mic_threshold,
-        "mic_detected": mic_detected,
-        "mic_available": MIC_AVAILABLE,
-        "mic_error": MIC_ERROR,
-        "detected": detected,
-        "photo_url": photo_url,
-        "history": [
-            {"t": int(ts * 1000), "rssi": val}
-            for ts, val in history
-        ],
-        "mic_history": [
-            {"t": int(ts * 1000), "level": val}
-            for ts, val in mic_history
-        ],
-        "doppler_score": doppler_score,
-        "doppler_detected": bool(doppler_score is not None and doppler_score >= DOPPLER_SCORE_THRESHOLD),
-        "doppler_history": [
-            {"t": int(ts * 1000), "score": val}
-            for ts, val in doppler_history
-        ],
-        "last_photo": last_photo_path,
-    }
 
+def _negotiate_ws_format(ws: WebSocket):
+    """Pick the wire format from ?format= or the offered subprotocols; returns (format, subprotocol)."""
+    offered = ws.scope.get("subprotocols") or []
+    if BINARY_SUBPROTOCOL in offered:
+        return "binary", BINARY_SUBPROTOCOL
+    if JSON_SUBPROTOCOL in offered:
+        return "json", JSON_SUBPROTOCOL
+    return ("binary" if ws.query_params.get("format") == "binary" else "json"), None
+
+
+async def _send_encoded(ws: WebSocket, data):
+    with stage_seconds.time("payload_send"):
+        if isinstance(data, bytes):
+            await ws.send_bytes(data)
+        else:
+            await ws.send_text(data)
+    events_total.inc("ws_frame_sent")
 
-@app.get("/metrics")
-def metrics():
-    return build_metrics_payload()
+
+async def _send_catch_up(ws: WebSocket, client: dict, fmt: str):
+    """Send a snapshot or delta built for this client alone and advance its cursor."""
+    with stage_seconds.time("payload_build"):
+        frame = build_stream_frame(client["cursor"], client["epoch"])
+    with stage_seconds.time("payload_encode"):
+        data = encode_frame(frame, fmt)
+    await _send_encoded(ws, data)
+    client["cursor"], client["epoch"] = frame["seq"], STREAM_EPOCH
 
 
 @app.websocket("/ws")
 async def websocket_metrics(ws: WebSocket):
+    fmt, subprotocol = _negotiate_ws_format(ws)
+    await ws.accept(subprotocol=subprotocol)
+    client = {
+        "cursor": _parse_cursor(ws.query_params.get("cursor")),
+        "epoch": ws.query_params.get("epoch"),
+    }
+    receiver = asyncio.create_task(_receive_cursor_updates(ws, client))
+    client_queue = hub.subscribe()
+    try:
+        # Initial snapshot (or catch-up delta) is built for this client alone;
+        # afterwards it shares the hub's frames while its cursor lines up.
+        await _send_catch_up(ws, client, fmt)
+        while not receiver.done():
+            get = asyncio.create_task(client_queue.get())
+            await asyncio.wait({get, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if not get.done():
+                get.cancel()
+                break
+            item = get.result()
+            if client["cursor"] == item.start and client["epoch"] == STREAM_EPOCH:
+                await _send_encoded(ws, item.encoded(fmt))
+                client["cursor"] = item.seq
+            elif client["cursor"] is not None and client["epoch"] == STREAM_EPOCH and item.seq <= client["cursor"]:
+                continue
+            else:
+                await _send_catch_up(ws, client, fmt)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.unsubscribe(client_queue)
+        if receiver.done() and not receiver.cancelled():
+            receiver.exception()  # consume the disconnect so it is not logged as unhandled
+        receiver.cancel()
+
+
+@app.post("/ingest")
+async def ingest_http(request: Request):
+    """Batched samples from remote agents: {"link", "samples": [[ts, rssi, noise, mic], ...]} or a list."""
+    try:
+        message = await request.json()
+    except Exception:
+        return {"error": "invalid JSON"}
+    peer = request.client.host if request.client else None
+    if ROLE == "viewer":
+        return await state_mirror.call("ingest", message=message, peer=peer)
+    return {"accepted": link_registry.ingest(message, peer=peer)}
+
+
+@app.websocket("/ingest/ws")
+async def ingest_ws(ws: WebSocket):
+    """Long-lived agent connection; each text message is one ingest message, acked with the count."""
     await ws.accept()
+    peer = ws.client.host if ws.client else None
     try:
         while True:
-            payload = build_metrics_payload()
-            await ws.send_json(payload)
-            await asyncio.sleep(0.3)
+            text = await ws.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                await ws.send_text(json.dumps({"error": "invalid JSON"}))
+                continue
+            if ROLE == "viewer":
+                reply = await state_mirror.call("ingest", message=message, peer=peer)
+            else:
+                reply = {"accepted": link_registry.ingest(message, peer=peer)}
+            await ws.send_text(json.dumps(reply))
     except WebSocketDisconnect:
         pass
 
 
+@app.get("/links")
+@owner_only
+def list_links():
+    now = time.time()
+    return {"links": [link.status(now) for link in sorted(link_registry.links.values(), key=lambda l: l.id)]}
+
+
+@app.get("/links/{link_id}")
+@owner_only
+def get_link(link_id: str, cursor: int = 0):
+    link = link_registry.links.get(link_id)
+    if link is None:
+        return {"error": "unknown link"}
+    return {**link.status(), "history": link.history.points(cursor)}
+
+
+@app.get("/health")
+def health():
+    """
+    Liveness plus start-up progress: `ready` turns true once every background
+    task has finished and, in a viewer worker, while it follows the sensor owner.
+    """
+    following = ROLE != "viewer" or state_mirror.connected
+    return {
+        "status": "ok",
+        "ready": startup_tasks.done and following,
+        "role": ROLE,
+        "owner_connected": following,
+        "startup_seconds": round(serving_since - STARTED_AT, 3) if serving_since is not None else None,
+        "uptime": round(time.time() - STARTED_AT, 1),
+        "tasks": startup_tasks.status(),
+        "rssi_source": rssi_source.name if rssi_source is not None else None,
+        "mic_available": MIC_AVAILABLE,
+        "mic_error": MIC_ERROR,
+        "camera": photo_worker.camera.name,
+    }
+
+
+@app.get("/internal/metrics", response_class=PlainTextResponse)
+def internal_metrics():
+    """Prometheus text exposition of hot-path timings and counters (not for the dashboard)."""
+    lines = stage_seconds.render() + loop_jitter_seconds.render() + events_total.render()
+    gauges = {
+        "beam_ws_subscribers": hub.subscriber_count,
+        "beam_photo_queue_pending": photo_worker.status()["pending"],
+        "beam_history_seq": _last_seq,
+        "beam_links_active": link_registry.summary()["active"],
+        "beam_sensor_owner": int(ROLE != "viewer"),
+        "beam_dsp_worker_alive": int(dsp_process is not None and dsp_process.alive()),
+        "beam_dsp_worker_dropped_frames": dsp_process.dropped if dsp_process is not None else 0,
+        "beam_ingest_rejected": link_registry.rejected,
+    }
+    for name, value in gauges.items():
+        lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+@app.get("/history")
+@owner_only
+def history_range(
+    series: str = "rssi",
+    from_ms: int = Query(None, alias="from"),
+    to_ms: int = Query(None, alias="to"),
+    limit: int = 10000,
+    max_points: int = None,
+    method: str = "lttb",
+):
+    """
+    Samples for one series between two epoch-millisecond timestamps. With
+    `max_points`, long windows are served from rollups and downsampled
+    (`method=lttb` or `minmax`) to at most that many points.
+    """
+    if series_store is None:
+        return {"error": "history store disabled"}
+    if series not in SERIES_KEYS:
+        return {"error": "invalid series", "series_names": sorted(SERIES_KEYS)}
+    t1 = to_ms / 1000 if to_ms is not None else time.time()
+    t0 = from_ms / 1000 if from_ms is not None else t1 - 600
+    key = SERIES_KEYS[series]
+    if max_points is not None:
+        if method not in ("lttb", "minmax"):
+            return {"error": "invalid method"}
+        resolution, points = downsample_series(series, t0, t1, min(max(max_points, 3), 100000), method)
+        return {
+            "series": series,
+            "from": int(t0 * 1000),
+            "to": int(t1 * 1000),
+            "resolution": resolution,
+            "points": [{"t": int(ts * 1000), key: round(value, 3)} for ts, value in points],
+        }
+    limit = min(max(limit, 1), 100000)
+    rows = series_store.query(series, t0, t1, limit=limit + 1)
+    return {
+        "series": series,
+        "from": int(t0 * 1000),
+        "to": int(t1 * 1000),
+        "truncated": len(rows) > limit,
+        "points": [{"t": int(ts * 1000), key: value} for ts, value in rows[:limit]],
+    }
+
+
+@app.get("/events")
+def list_events(
+    from_ms: int = Query(None, alias="from"),
+    to_ms: int = Query(None, alias="to"),
+    mode: str = None,
+    sensor: str = None,
+    min_duration: float = None,
+    limit: int = 100,
+    cursor: str = None,
+):
+    """
+    Detection episodes, newest first, optionally within epoch-millisecond
+    `from`/`to`, for one `mode`, involving one `sensor` (rssi|mic|doppler) or
+    lasting at least `min_duration` seconds. Pass the returned `next_cursor` as
+    `cursor` for the next page.
+    """
+    if event_log is None:
+        return {"error": "event log disabled"}
+    if sensor is not None and sensor not in EventLog.SENSORS:
+        return {"error": "invalid sensor", "sensors": list(EventLog.SENSORS)}
+    before = None
+    if cursor:
+        try:
+            start, _, event_id = cursor.partition(":")
+            before = (float(start), int(event_id))
+        except ValueError:
+            return {"error": "invalid cursor"}
+    events, next_before = event_log.query(
+        t0=from_ms / 1000 if from_ms is not None else None,
+        t1=to_ms / 1000 if to_ms is not None else None,
+        mode=mode,
+        sensor=sensor,
+        min_duration=min_duration,
+        limit=min(max(limit, 1), 1000),
+        before=before,
+    )
+    return {
+        "events": events,
+        "next_cursor": f"{next_before[0]!r}:{next_before[1]}" if next_before is not None else None,
+    }
+
+
+@app.get("/events/{event_id}")
+def get_event(event_id: int):
+    if event_log is None:
+        return {"error": "event log disabled"}
+    event = event_log.get(event_id)
+    return event if event is not None else {"error": "unknown event"}
+
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+
 @app.get("/photo")
-def photo():
-    if last_photo_path and os.path.exists(last_photo_path):
-        return FileResponse(last_photo_path)
-    return {"error": "no photo yet"}
+def photo(size: str = None):
+    """Latest capture: redirects to its immutable URL (`size=thumb` for the preview)."""
+    last_photo = sensor_state.get().last_photo
+    if not last_photo:
+        return {"error": "no photo yet"}
+    url = f"/photos/{os.path.basename(last_photo)}"
+    return RedirectResponse(f"{url}?size=thumb" if size == "thumb" else url)
+
+
+@app.get("/photos")
+@owner_only
+def list_photos(from_ms: int = Query(None, alias="from"), to_ms: int = Query(None, alias="to"), limit: int = 100):
+    """Captures between epoch-millisecond timestamps, newest first, from the in-memory index."""
+    records = photo_store.query(
+        t0=from_ms / 1000 if from_ms is not None else None,
+        t1=to_ms / 1000 if to_ms is not None else None,
+        limit=min(max(limit, 1), 10000),
+    )
+    return {"photos": [record.as_dict() for record in records], **photo_store.status()}
+
+
+@app.get("/photos/{name}")
+def photo_file(name: str, size: str = None):
+    """A capture (or with `size=thumb` its thumbnail); names are content-hashed, so cached for a year."""
+    path = photo_store.path(name)
+    if path is None:
+        return Response(status_code=404)
+    if size == "thumb":
+        try:
+            path = photo_store.thumbnail(name) or path
+        except Exception as exc:
+            print(f"WARNING: thumbnail for {name} failed: {exc}")
+    return FileResponse(path, headers={"Cache-Control": IMMUTABLE_CACHE})
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -644,16 +4276,25 @@ input#threshold-input {
       <div class="muted">Refresh: <span id="rate-label">300 ms</span></div>
     </div>
     <div class="row chips">
-      <button class="chip active" data-rate="300" onclick="setRate(this)">300 ms</button>
-      <button class="chip" data-rate="500" onclick="setRate(this)">500 ms</button>
-      <button class="chip" data-rate="1000" onclick="setRate(this)">1 s</button>
-      <button class="chip" data-rate="2000" onclick="setRate(this)">2 s</button>
+      <button class="chip rate-chip active" data-rate="300" onclick="setRate(this)">300 ms</button>
+      <button class="chip rate-chip" data-rate="500" onclick="setRate(this)">500 ms</button>
+      <button class="chip rate-chip" data-rate="1000" onclick="setRate(this)">1 s</button>
+      <button class="chip rate-chip" data-rate="2000" onclick="setRate(this)">2 s</button>
+    </div>
+    <div class="row">
+      <div class="muted">Chart:</div>
+      <div class="mode-toggle-row">
+        <button class="chip window-chip active" data-window="0" onclick="setWindow(this)">Live</button>
+        <button class="chip window-chip" data-window="3600" onclick="setWindow(this)">1 h</button>
+        <button class="chip window-chip" data-window="86400" onclick="setWindow(this)">24 h</button>
+      </div>
     </div>
     <div class="row">
       <div class="muted">Mode:</div>
       <div class="mode-toggle-row">
         <button class="chip mode-chip active" data-mode="air" onclick="setModeClick(this)">Air</button>
         <button class="chip mode-chip" data-mode="wall" onclick="setModeClick(this)">Wall</button>
+        <button class="chip mode-chip" data-mode="cusum" onclick="setModeClick(this)">CUSUM</button>
       </div>
     </div>
     <div class="row">
@@ -685,6 +4326,11 @@ input#threshold-input {
       <div class="value"><span id="mic-baseline">?</span> dBFS</div>
       <div class="muted">Spike threshold: <span id="mic-threshold">6</span> dB</div>
     </div>
+    <div class="card">
+      <div class="label">Presence</div>
+      <div class="value"><span id="fusion-prob">?</span> %</div>
+      <div class="muted" id="fusion-parts">Fused RSSI + mic + Doppler</div>
+    </div>
     <div class="card">
       <div class="label">Doppler Score</div>
       <div class="value"><span id="doppler-score">?</span></div>
@@ -732,21 +4378,20 @@ let micThreshold = 6;
 let mode = "air";
 let pollMs = 300;
 let pollHandle = null;
-let chartPoints = [];
-let micChartPoints = [];
+let metricsEtag = null;
+let chartWindowSec = 0;  // 0 = live stream, else seconds of stored history
+let rangeHandle = null;
 let lastBaseline = null;
 let lastMicBaseline = null;
 let dopplerScore = null;
 let socket = null;
 let lastPhotoUrl = null;
+let streamCursor = null;
+let streamEpoch = null;
+const HISTORY_LIMIT = 600;  // live samples kept per series, same as the server's window
+const RANGE_LIMIT = 4096;  // points kept for a /history window
 
-const wifiCanvas = document.getElementById("chart");
-const micCanvas = document.getElementById("mic-chart");
-const wifiCtx = wifiCanvas.getContext("2d");
-const micCtx = micCanvas.getContext("2d");
 const dpr = window.devicePixelRatio || 1;
-let wifiSize = {width: 0, height: 0};
-let micSize = {width: 0, height: 0};
 
 const wifiPalette = {
     line: '#22d3ee',
@@ -771,85 +4416,309 @@ function ensureCanvasSize(canvas, ctx, size) {
     ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
 }
 
-function renderSeries(canvas, ctx, size, points, baseline, valueKey, palette, emptyLabel) {
-    if (!canvas) return;
-    if (!size.width || !size.height) {
-        ensureCanvasSize(canvas, ctx, size);
+// Fixed-size ring of (t, value) samples, so memory stays flat however long the page is open
+class SeriesRing {
+    constructor(capacity) {
+        this.capacity = capacity;
+        this.t = new Float64Array(capacity);
+        this.v = new Float64Array(capacity);
+        this.clear();
     }
 
-    ctx.clearRect(0, 0, size.width, size.height);
+    clear() {
+        this.start = 0;
+        this.length = 0;
+        this.added = 0;  // total pushes, so a chart can tell how many samples are new
+    }
 
-    if (!points || !points.length) {
-        ctx.fillStyle = 'rgba(229,231,235,0.6)';
-        ctx.font = '14px Space Grotesk, sans-serif';
-        ctx.fillText(emptyLabel, 16, size.height / 2);
-        return;
+    index(k) {
+        return (this.start + k) % this.capacity;
     }
 
-    const xs = points.map(p => p.t);
-    const ys = points.map(p => p[valueKey]);
-    const minX = Math.min(...xs);
-    const maxX = Math.max(...xs);
-    const minY = Math.min(...ys, baseline ?? ys[0]);
-    const maxY = Math.max(...ys, baseline ?? ys[0]);
-    const spanX = Math.max(1, maxX - minX);
-    const spanY = Math.max(1, maxY - minY);
-    const margin = 18;
-
-    const x = t => {
-        const n = (t - minX) / spanX;
-        return margin + n * (size.width - margin * 2);
-    };
+    get lastT() {
+        return this.length ? this.t[this.index(this.length - 1)] : -Infinity;
+    }
 
-    const y = v => {
-        const n = (v - minY) / spanY;
-        return size.height - margin - n * (size.height - margin * 2);
-    };
+    push(t, v) {
+        if (t <= this.lastT) return;
+        const i = this.index(this.length);
+        this.t[i] = t;
+        this.v[i] = v ?? NaN;
+        if (this.length < this.capacity) {
+            this.length++;
+        } else {
+            this.start = (this.start + 1) % this.capacity;
+        }
+        this.added++;
+    }
+
+    // A frame's series: point objects (JSON) or {key, t, v} typed arrays (binary)
+    append(series, key) {
+        if (!series) return;
+        if (Array.isArray(series)) {
+            for (const p of series) this.push(p.t, p[key]);
+        } else {
+            for (let i = 0; i < series.t.length; i++) this.push(series.t[i], series.v[i]);
+        }
+    }
+}
+
+// Scrolling chart over a SeriesRing. An update blits the plot left by the elapsed time and
+// draws only the new slice; the scale is refit (full redraw) only on resize, a new extreme,
+// a baseline change, a resync, or once a whole window has scrolled past.
+class StripChart {
+    constructor(canvas, palette) {
+        this.canvas = canvas;
+        this.ctx = canvas.getContext("2d");
+        this.palette = palette;
+        this.size = {width: 0, height: 0};
+        this.margin = 18;
+        this.ring = null;
+        this.needsFull = true;
+    }
+
+    resize() {
+        ensureCanvasSize(this.canvas, this.ctx, this.size);
+        this.needsFull = true;
+    }
+
+    x(t) {
+        return this.plotRight - (this.rightT - t) * this.pxPerMs;
+    }
+
+    y(v) {
+        const n = (v - this.minY) / (this.maxY - this.minY);
+        return this.size.height - this.margin - n * (this.size.height - this.margin * 2);
+    }
+
+    // windowMs: time shown across the plot; null sizes it to the ring's capacity at the current sample rate
+    render(ring, baseline, windowMs, emptyLabel) {
+        if (!this.size.width || !this.size.height) this.resize();
+        baseline = baseline ?? null;
+        if (ring !== this.ring || baseline !== this.baseline || windowMs !== this.windowMs || emptyLabel !== this.emptyLabel) {
+            this.needsFull = true;
+        }
+        this.ring = ring;
+        this.baseline = baseline;
+        this.windowMs = windowMs;
+        this.emptyLabel = emptyLabel;
+        if (this.needsFull || !this.scroll()) this.drawFull();
+    }
+
+    drawFull() {
+        const {ctx, ring, size, margin} = this;
+        this.needsFull = false;
+        this.drawn = ring.added;
+        this.dot = null;
+        this.scrolled = 0;
+        ctx.clearRect(0, 0, size.width, size.height);
+
+        let lo = Infinity;
+        let hi = -Infinity;
+        for (let k = 0; k < ring.length; k++) {
+            const v = ring.v[ring.index(k)];
+            if (v < lo) lo = v;
+            if (v > hi) hi = v;
+        }
+        if (lo === Infinity) {
+            this.empty = true;
+            ctx.fillStyle = 'rgba(229,231,235,0.6)';
+            ctx.font = '14px Space Grotesk, sans-serif';
+            ctx.fillText(this.emptyLabel, 16, size.height / 2);
+            return;
+        }
+        this.empty = false;
+        if (this.baseline !== null) {
+            lo = Math.min(lo, this.baseline);
+            hi = Math.max(hi, this.baseline);
+        }
+        // Headroom so ordinary wiggles don't force a refit
+        const pad = Math.max(1, hi - lo) * 0.15;
+        this.minY = lo - pad;
+        this.maxY = hi + pad;
+
+        const plotWidth = size.width - margin * 2;
+        const firstT = ring.t[ring.index(0)];
+        const lastT = ring.lastT;
+        const spacing = ring.length > 1 ? (lastT - firstT) / (ring.length - 1) : 1000;
+        this.pxPerMs = plotWidth / Math.max(1, this.windowMs ?? spacing * ring.capacity);
+        this.plotRight = size.width - margin;
+        this.rightT = lastT;
+        this.gradient = ctx.createLinearGradient(0, margin, 0, size.height - margin);
+        this.gradient.addColorStop(0, this.palette.fillTop);
+        this.gradient.addColorStop(1, this.palette.fillBottom);
+        this.drawSlice(margin, 0);
+        this.drawDot();
+    }
+
+    // Returns false when the new samples don't fit the current scale
+    scroll() {
+        const {ctx, ring, size, margin} = this;
+        const fresh = ring.added - this.drawn;
+        if (fresh <= 0) return true;
+        if (this.empty || fresh >= ring.length) return false;
+        for (let k = ring.length - fresh; k < ring.length; k++) {
+            const v = ring.v[ring.index(k)];
+            if (v < this.minY || v > this.maxY) return false;
+        }
+        // Whole device pixels, so repeated blits never blur
+        const shiftDev = Math.max(0, Math.round((ring.lastT - this.rightT) * this.pxPerMs * dpr));
+        const shift = shiftDev / dpr;
+        if (this.scrolled + shift >= size.width - margin * 2) return false;
+
+        this.clearDot();
+        const marginDev = Math.round(margin * dpr);
+        const widthDev = this.canvas.width;
+        if (shiftDev > 0) {
+            ctx.save();
+            ctx.setTransform(1, 0, 0, 1, 0, 0);
+            ctx.drawImage(this.canvas, marginDev + shiftDev, 0, widthDev - marginDev - shiftDev, this.canvas.height,
+                marginDev, 0, widthDev - marginDev - shiftDev, this.canvas.height);
+            ctx.restore();
+        }
+        this.rightT += shift / this.pxPerMs;
+        this.scrolled += shift;
+        this.drawn = ring.added;
+
+        // Redraw from the previous newest sample so the joint is seamless
+        const fromK = ring.length - fresh - 1;
+        const clearX = Math.max(margin, Math.floor(this.x(ring.t[ring.index(fromK)])));
+        ctx.clearRect(clearX, 0, size.width - clearX, size.height);
+        this.drawSlice(clearX, fromK);
+        this.drawDot();
+        return true;
+    }
 
-    if (baseline !== null && baseline !== undefined) {
+    // Baseline and series from ring position fromK on, clipped to x >= left
+    drawSlice(left, fromK) {
+        const {ctx, ring, size, margin, palette} = this;
+        const bottom = size.height - margin;
         ctx.save();
-        ctx.setLineDash([6, 6]);
-        ctx.strokeStyle = palette.baseline;
-        ctx.lineWidth = 1.2;
         ctx.beginPath();
-        ctx.moveTo(x(minX), y(baseline));
-        ctx.lineTo(x(maxX), y(baseline));
-        ctx.stroke();
+        ctx.rect(left, 0, size.width - left, size.height);
+        ctx.clip();
+
+        if (this.baseline !== null) {
+            ctx.setLineDash([6, 6]);
+            ctx.lineDashOffset = this.scrolled;  // keep the dashes in phase with the scrolled part
+            ctx.strokeStyle = palette.baseline;
+            ctx.lineWidth = 1.2;
+            ctx.beginPath();
+            ctx.moveTo(margin, this.y(this.baseline));
+            ctx.lineTo(this.plotRight, this.y(this.baseline));
+            ctx.stroke();
+            ctx.setLineDash([]);
+        }
+
+        const line = new Path2D();
+        const fill = new Path2D();
+        let firstX = null;
+        let lastX = null;
+        const closeRun = () => {
+            if (firstX === null) return;
+            fill.lineTo(lastX, bottom);
+            fill.lineTo(firstX, bottom);
+            fill.closePath();
+            firstX = null;
+        };
+        for (let k = fromK; k < ring.length; k++) {
+            const i = ring.index(k);
+            if (Number.isNaN(ring.v[i])) {
+                closeRun();
+                continue;
+            }
+            const px = this.x(ring.t[i]);
+            const py = this.y(ring.v[i]);
+            if (firstX === null) {
+                line.moveTo(px, py);
+                fill.moveTo(px, py);
+                firstX = px;
+            } else {
+                line.lineTo(px, py);
+                fill.lineTo(px, py);
+            }
+            lastX = px;
+        }
+        closeRun();
+        ctx.fillStyle = this.gradient;
+        ctx.fill(fill);
+        ctx.strokeStyle = palette.line;
+        ctx.lineWidth = 2;
+        ctx.stroke(line);
         ctx.restore();
     }
 
-    ctx.beginPath();
-    ctx.moveTo(x(points[0].t), y(points[0][valueKey]));
-    for (let i = 1; i < points.length; i++) {
-        ctx.lineTo(x(points[i].t), y(points[i][valueKey]));
+    // The newest-sample marker must not be scrolled with the plot, so keep the pixels under it
+    drawDot() {
+        const {ctx, ring} = this;
+        const i = ring.index(ring.length - 1);
+        if (Number.isNaN(ring.v[i])) return;
+        const px = this.x(ring.t[i]);
+        const py = this.y(ring.v[i]);
+        const r = 8;
+        const sx = Math.floor((px - r) * dpr);
+        const sy = Math.floor((py - r) * dpr);
+        this.dot = {x: sx, y: sy, pixels: ctx.getImageData(sx, sy, Math.ceil(2 * r * dpr) + 1, Math.ceil(2 * r * dpr) + 1)};
+        ctx.fillStyle = this.palette.line;
+        ctx.strokeStyle = '#0f172a';
+        ctx.lineWidth = 2;
+        ctx.beginPath();
+        ctx.arc(px, py, 5, 0, Math.PI * 2);
+        ctx.fill();
+        ctx.stroke();
+    }
+
+    clearDot() {
+        if (this.dot) this.ctx.putImageData(this.dot.pixels, this.dot.x, this.dot.y);
+        this.dot = null;
+    }
+}
+
+const wifiChart = new StripChart(document.getElementById("chart"), wifiPalette);
+const micChart = new StripChart(document.getElementById("mic-chart"), micPalette);
+const wifiRing = new SeriesRing(HISTORY_LIMIT);
+const micRing = new SeriesRing(HISTORY_LIMIT);
+const wifiRangeRing = new SeriesRing(RANGE_LIMIT);
+const micRangeRing = new SeriesRing(RANGE_LIMIT);
+
+// Binary frames: "BEAM" | version | pad | u32 header length | JSON header | typed arrays
+function decodeBinaryFrame(buffer) {
+    const view = new DataView(buffer);
+    const headLen = view.getUint32(8, true);
+    const frame = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headLen)));
+    const base = 12 + headLen;
+    for (const spec of frame.arrays) {
+        frame[spec.name] = {
+            key: spec.key,
+            t: new Float64Array(buffer, base + spec.t, spec.length),
+            v: new Float32Array(buffer, base + spec.v, spec.length),
+        };
     }
-    ctx.lineTo(x(points[points.length - 1].t), size.height - margin);
-    ctx.lineTo(x(points[0].t), size.height - margin);
-    ctx.closePath();
-
-    const gradient = ctx.createLinearGradient(0, margin, 0, size.height - margin);
-    gradient.addColorStop(0, palette.fillTop);
-    gradient.addColorStop(1, palette.fillBottom);
-    ctx.fillStyle = gradient;
-    ctx.fill();
-
-    ctx.beginPath();
-    ctx.moveTo(x(points[0].t), y(points[0][valueKey]));
-    for (let i = 1; i < points.length; i++) {
-        ctx.lineTo(x(points[i].t), y(points[i][valueKey]));
+    delete frame.arrays;
+    return frame;
+}
+
+// Apply a snapshot or delta frame; returns false when the client must resync.
+function applyFrame(data) {
+    if (data.type === "delta") {
+        if (data.epoch !== streamEpoch || streamCursor === null || data.from > streamCursor) {
+            streamCursor = null;
+            return false;
+        }
+        wifiRing.append(data.history, "rssi");
+        micRing.append(data.mic_history, "level");
+        streamCursor = Math.max(streamCursor, data.seq);
+    } else {
+        wifiRing.clear();
+        micRing.clear();
+        wifiRing.append(data.history, "rssi");
+        micRing.append(data.mic_history, "level");
+        wifiChart.needsFull = micChart.needsFull = true;
+        streamCursor = data.seq ?? null;
+        streamEpoch = data.epoch ?? null;
     }
-    ctx.strokeStyle = palette.line;
-    ctx.lineWidth = 2;
-    ctx.stroke();
-
-    const lastPoint = points[points.length - 1];
-    ctx.fillStyle = palette.line;
-    ctx.strokeStyle = '#0f172a';
-    ctx.lineWidth = 2;
-    ctx.beginPath();
-    ctx.arc(x(lastPoint.t), y(lastPoint[valueKey]), 5, 0, Math.PI * 2);
-    ctx.fill();
-    ctx.stroke();
+    handleMetricsData(data);
+    return true;
 }
 
 function handleMetricsData(data) {
@@ -890,6 +4759,13 @@ function handleMetricsData(data) {
     dopplerScore = data.doppler_score ?? dopplerScore;
     document.getElementById("doppler-score").textContent =
         dopplerScore === null || dopplerScore === undefined ? "?" : dopplerScore.toFixed(3);
+    if (data.fusion !== undefined) {
+        const fusion = data.fusion;
+        document.getElementById("fusion-prob").textContent = fusion ? (fusion.probability * 100).toFixed(0) : "?";
+        document.getElementById("fusion-parts").textContent = fusion
+            ? Object.entries(fusion.contributions).map(([k, v]) => `${k} ${v >= 0 ? "+" : ""}${v.toFixed(1)}`).join("  ")
+            : "Waiting for baselines";
+    }
 
     const micState = document.getElementById("mic-state");
     if (!data.mic_available) {
@@ -900,38 +4776,27 @@ function handleMetricsData(data) {
         micState.textContent = "Ambient level vs baseline";
     }
 
-    chartPoints = data.history || [];
-    micChartPoints = data.mic_history || [];
     lastBaseline = data.baseline;
     lastMicBaseline = data.mic_baseline;
-    renderSeries(wifiCanvas, wifiCtx, wifiSize, chartPoints, lastBaseline, "rssi", wifiPalette, "Waiting for RSSI samples…");
-    renderSeries(micCanvas, micCtx, micSize, micChartPoints, lastMicBaseline, "level", micPalette, data.mic_available ? "Waiting for mic samples…" : "Mic unavailable");
-
-    if (data.last_photo) {
-        const box = document.getElementById("photoBox");
-        let img = box.querySelector("img");
-        if (!img) {
-            img = document.createElement("img");
-            box.appendChild(img);
-        }
-        img.style.opacity = 0;
-        img.onload = () => { img.style.opacity = 1; };
-        img.src = "/photo?cache=" + Math.random();
-    }
+    renderCharts(data.mic_available);
 
     const photoBox = document.getElementById("photoBox");
     if (photoBox) {
         const url = data.photo_url;
-        // Only update the DOM if the photo URL actually changed
+        // Only update the DOM if the photo URL actually changed; URLs are immutable, so no cache-busting
         if (url && url !== lastPhotoUrl) {
             lastPhotoUrl = url;
             photoBox.innerHTML = "";
+            const link = document.createElement("a");
+            link.href = url;
+            link.target = "_blank";
             const img = document.createElement("img");
-            img.src = url + `?t=${Date.now()}`; // cache-bust so latest photo loads
+            img.src = data.photo_thumb_url || url;
             img.onload = () => {
                 img.style.opacity = "1";
             };
-            photoBox.appendChild(img);
+            link.appendChild(img);
+            photoBox.appendChild(link);
         }
     }
 
@@ -967,7 +4832,7 @@ async function setMode(newMode) {
         const res = await fetch(`/mode?new_mode=${encodeURIComponent(newMode)}`, { method: "POST" });
         const data = await res.json();
         if (data.error) return;
-        handleMetricsData({...data, history: chartPoints, mic_history: micChartPoints});
+        handleMetricsData(data);
     } catch (e) {
         // ignore; UI will resync on next update
     }
@@ -993,14 +4858,64 @@ async function updateThreshold() {
     }
 }
 
+function renderCharts(micAvailable) {
+    const windowMs = chartWindowSec ? chartWindowSec * 1000 : null;
+    wifiChart.render(chartWindowSec ? wifiRangeRing : wifiRing, lastBaseline, windowMs, "Waiting for RSSI samples…");
+    micChart.render(chartWindowSec ? micRangeRing : micRing, lastMicBaseline, windowMs, micAvailable ? "Waiting for mic samples…" : "Mic unavailable");
+}
+
+// Long windows come from /history, downsampled server-side to about one point per pixel
+async function loadRange() {
+    if (!chartWindowSec) return;
+    const to = Date.now();
+    const from = to - chartWindowSec * 1000;
+    const maxPoints = Math.min(RANGE_LIMIT, Math.max(100, Math.round(wifiChart.size.width || 600)));
+    try {
+        const [rssi, mic] = await Promise.all(["rssi", "mic"].map(series =>
+            fetch(`/history?series=${series}&from=${from}&to=${to}&max_points=${maxPoints}`).then(r => r.json())
+        ));
+        wifiRangeRing.clear();
+        micRangeRing.clear();
+        wifiRangeRing.append(rssi.points, "rssi");
+        micRangeRing.append(mic.points, "level");
+        wifiChart.needsFull = micChart.needsFull = true;
+        renderCharts(true);
+    } catch (e) {
+        // keep the previous range; retried on the next refresh
+    }
+}
+
+function setWindow(buttonEl) {
+    chartWindowSec = parseInt(buttonEl.getAttribute("data-window"), 10) || 0;
+    document.querySelectorAll(".window-chip").forEach(b => b.classList.remove("active"));
+    buttonEl.classList.add("active");
+    if (rangeHandle) clearInterval(rangeHandle);
+    rangeHandle = chartWindowSec ? setInterval(loadRange, 10000) : null;
+    if (chartWindowSec) {
+        loadRange();
+    } else {
+        renderCharts(true);
+    }
+}
+
 function setRate(buttonEl) {
     const ms = parseInt(buttonEl.getAttribute("data-rate"), 10);
     pollMs = ms;
     document.getElementById("rate-label").textContent = ms >= 1000 ? `${ms/1000} s` : `${ms} ms`;
-    document.querySelectorAll(".chip").forEach(b => b.classList.remove("active"));
+    document.querySelectorAll(".rate-chip").forEach(b => b.classList.remove("active"));
     buttonEl.classList.add("active");
+    startPolling();
+}
+
+// /metrics polling is only a fallback for when the WebSocket is down
+function startPolling() {
+    if (pollHandle) clearInterval(pollHandle);
+    pollHandle = socket && socket.readyState === WebSocket.OPEN ? null : setInterval(update, pollMs);
+}
+
+function stopPolling() {
     if (pollHandle) clearInterval(pollHandle);
-    pollHandle = setInterval(update, pollMs);
+    pollHandle = null;
 }
 
 async function doCalibrate() {
@@ -1013,9 +4928,13 @@ async function doCalibrate() {
 
 async function update() {
     try {
-        const res = await fetch("/metrics");
+        const query = `cursor=${streamCursor ?? ""}&epoch=${streamEpoch ?? ""}`;
+        const headers = metricsEtag ? {"If-None-Match": metricsEtag} : {};
+        const res = await fetch(`/metrics?${query}`, {headers, cache: "no-store"});
+        if (res.status === 304) return;
+        metricsEtag = res.headers.get("ETag");
         const data = await res.json();
-        handleMetricsData(data);
+        applyFrame(data);
     } catch (e) {
         const status = document.getElementById("status");
         status.textContent = "Connection lost";
@@ -1026,16 +4945,21 @@ async function update() {
 
 function connectWebSocket() {
     const wsProtocol = location.protocol === "https:" ? "wss" : "ws";
-    socket = new WebSocket(`${wsProtocol}://${location.host}/ws`);
+    const query = `cursor=${streamCursor ?? ""}&epoch=${streamEpoch ?? ""}`;
+    socket = new WebSocket(`${wsProtocol}://${location.host}/ws?${query}`, "beam.bin.v1");
+    socket.binaryType = "arraybuffer";
 
     socket.onopen = () => {
         console.log("WebSocket connected");
+        stopPolling();
     };
 
     socket.onmessage = (event) => {
         try {
-            const data = JSON.parse(event.data);
-            handleMetricsData(data);
+            const data = typeof event.data === "string" ? JSON.parse(event.data) : decodeBinaryFrame(event.data);
+            if (!applyFrame(data)) {
+                socket.send(JSON.stringify({resync: true}));
+            }
         } catch (e) {
             console.error("Failed to parse WS message", e);
         }
@@ -1044,6 +4968,7 @@ function connectWebSocket() {
     socket.onclose = () => {
         console.log("WebSocket closed, retrying in 2s...");
         setTimeout(connectWebSocket, 2000);
+        startPolling();
         const status = document.getElementById("status");
         status.textContent = "Connection lost";
         status.className = "badge alert";
@@ -1055,15 +4980,14 @@ function connectWebSocket() {
 }
 
 function resizeAll() {
-    ensureCanvasSize(wifiCanvas, wifiCtx, wifiSize);
-    ensureCanvasSize(micCanvas, micCtx, micSize);
-    renderSeries(wifiCanvas, wifiCtx, wifiSize, chartPoints, lastBaseline, "rssi", wifiPalette, "Waiting for RSSI samples…");
-    renderSeries(micCanvas, micCtx, micSize, micChartPoints, lastMicBaseline, "level", micPalette, "Waiting for mic samples…");
+    wifiChart.resize();
+    micChart.resize();
+    renderCharts(true);
 }
 
 update();
 resizeAll();
-pollHandle = setInterval(update, pollMs);
+startPolling();
 connectWebSocket();
 window.addEventListener('resize', resizeAll);
 </script>
@@ -0,0 +1,456 @@
+"""
+End-to-end benchmarks for beam.py, driven by synthetic sensor sources.
+
+    python bench.py                  # everything, JSON to stdout
+    python bench.py --quick --out bench.json
+    python bench.py --only payload,dsp
+
+Needs the server requirements plus `websockets` (already used by test.py).
+No Wi-Fi card, microphone or camera is touched.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INVOKED_FROM = os.getcwd()
+sys.path.insert(0, HERE)
+
+# Keep the benchmark away from real hardware and from the working directory
+os.environ.setdefault("BEAM_STORE", "0")
+os.environ.setdefault("CAMERA", "fake")
+os.chdir(tempfile.mkdtemp(prefix="beam-bench-"))
+
+import beam  # noqa: E402
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+
+
+def summarize(samples):
+    """Mean and percentiles (in the samples' own unit)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pct(50),
+        "p90": pct(90),
+        "p99": pct(99),
+        "max": ordered[-1],
+    }
+
+
+class SyntheticRssiSource(beam.RssiSource):
+    """Steady RSSI with small noise; `drop()` makes the next samples fall by `depth` dB."""
+
+    name = "synthetic"
+
+    def __init__(self, level=-40, depth=15):
+        self.level = level
+        self.depth = depth
+        self.dropped = False
+        self.first_drop_ts = None
+        self._n = 0
+
+    def drop(self, on=True):
+        self.dropped = on
+        self.first_drop_ts = None
+
+    def read(self):
+        self._n += 1
+        ts = time.time()
+        rssi = self.level + (1 if self._n % 3 == 0 else 0)
+        if self.dropped:
+            rssi -= self.depth
+            if self.first_drop_ts is None:
+                self.first_drop_ts = ts
+        return ts, rssi, -90
+
+
+def use_series(size):
+    """Swap in fresh history series holding `size` samples each."""
+    beam.history = beam.SampleSeries("rssi", maxlen=size)
+    beam.mic_history = beam.SampleSeries("level", maxlen=size)
+    beam.doppler_history = beam.SampleSeries("score", maxlen=size)
+    beam.STREAM_SERIES = (
+        ("history", beam.history),
+        ("mic_history", beam.mic_history),
+        ("doppler_history", beam.doppler_history),
+    )
+    start = time.time() - size
+    for i in range(size):
+        beam.history.append(start + i, -40 - i % 7)
+        beam.mic_history.append(start + i, -35.5 + i % 3)
+        beam.doppler_history.append(start + i, 0.01 * (i % 5))
+
+
+def timed(fn, repeat):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - started) * 1e3)
+    return summarize(durations)
+
+
+def bench_payload(quick):
+    """Full payload build + JSON/binary encode time and size vs history length, plus one delta."""
+    results = []
+    for size in (60, 600, 6000) if quick else (60, 600, 6000, 60000):
+        use_series(size)
+        repeat = 5 if size >= 60000 else 30
+        payload = beam.build_metrics_payload()
+        cursor = beam._last_seq - 3
+        results.append({
+            "history_len": size,
+            "build_ms": timed(beam.build_metrics_payload, repeat),
+            "json_encode_ms": timed(lambda: json.dumps(payload), repeat),
+            "binary_encode_ms": timed(lambda: beam.encode_binary_frame(payload), repeat),
+            "json_bytes": len(json.dumps(payload)),
+            "binary_bytes": len(beam.encode_binary_frame(payload)),
+            "delta_build_ms": timed(lambda: beam.build_stream_frame(cursor, beam.STREAM_EPOCH), repeat),
+            "delta_json_bytes": len(json.dumps(beam.build_stream_frame(cursor, beam.STREAM_EPOCH))),
+        })
+    use_series(600)
+    return results
+
+
+def bench_dsp(quick):
+    """Per-block cost of the mic pipeline (level meter + Doppler) on synthetic audio, per Doppler backend."""
+    if beam.load_numpy() is None:
+        return {"skipped": "numpy not available"}
+    samplerate = beam.DOPPLER_SAMPLERATE
+    blocksize = beam.AUDIO_BLOCKSIZE
+    seconds = 5 if quick else 20
+    audio = _synthetic_audio(samplerate, seconds)
+    block_us, engine_us = {}, {}
+    for backend in ("fft", "sdft"):
+        beam.audio_ring = beam.AudioRing(int(beam.AUDIO_RING_SECONDS * samplerate), samplerate)
+        engine = beam.make_doppler_engine(backend)
+        beam.doppler_engine = beam.make_doppler_engine(backend)
+        # Build the cached per-backend plans outside the timed loop
+        scratch = beam.AudioRing(4 * beam.DOPPLER_FRAMES, samplerate)
+        scratch.write(audio[:2 * beam.DOPPLER_FRAMES], time.time())
+        beam.make_doppler_engine(backend).process(scratch)
+        durations, engine_durations = [], []
+        for start in range(0, audio.size - blocksize + 1, blocksize):
+            beam.audio_ring.write(audio[start:start + blocksize], time.time())
+            block = beam.audio_ring.latest(blocksize)
+            started = time.perf_counter()
+            beam.analyze_audio_block(block, time.time())
+            durations.append((time.perf_counter() - started) * 1e6)
+            started = time.perf_counter()
+            engine.process(beam.audio_ring)
+            engine_durations.append((time.perf_counter() - started) * 1e6)
+        block_us[backend] = summarize(durations)
+        engine_us[backend] = summarize(engine_durations)
+    beam.doppler_engine = beam.make_doppler_engine()
+    return {
+        "samplerate": samplerate,
+        "blocksize": blocksize,
+        "carriers": beam.DOPPLER_CARRIERS,
+        "block_us": block_us,
+        "engine_us": engine_us,
+        "realtime_budget_us": blocksize / samplerate * 1e6,
+    }
+
+
+def _synthetic_audio(samplerate, seconds):
+    np = beam.load_numpy()
+    t = np.arange(int(samplerate * seconds)) / samplerate
+    noise = 0.01 * np.random.default_rng(0).standard_normal(t.size)
+    tones = sum(np.sin(2 * np.pi * carrier * t) for carrier in beam.DOPPLER_CARRIERS)
+    return (0.05 * tones + noise).astype(np.float32)
+
+
+class ServerThread:
+    """Run beam.app under uvicorn on an ephemeral port in a background thread."""
+
+    def __init__(self):
+        beam.app.router.on_startup.clear()
+        config = uvicorn.Config(beam.app, host="127.0.0.1", port=0, log_level="error", ws_ping_interval=None)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        self.port = self.server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+def start_synthetic_sampler(rate_hz):
+    source = SyntheticRssiSource()
+    beam.rssi_source = source
+    beam.RSSI_RATE_HZ = rate_hz
+    beam.sensor_state.publish(baseline=source.level)
+    threading.Thread(target=beam.sampler_loop, daemon=True).start()
+    return source
+
+
+async def _detection_latency(port, source, trials):
+    latencies = []
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws") as ws:
+        for _ in range(trials):
+            source.drop(False)
+            while json.loads(await ws.recv())["detected"]:
+                pass
+            await asyncio.sleep(0.2)
+            source.drop(True)
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame["detected"] and source.first_drop_ts is not None:
+                    latencies.append((time.time() - source.first_drop_ts) * 1e3)
+                    break
+    return latencies
+
+
+async def _fanout(port, clients, seconds):
+    counts = [0] * clients
+    received_bytes = [0]
+    stop = asyncio.Event()
+
+    async def client(i):
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws", max_queue=None) as ws:
+            while not stop.is_set():
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                counts[i] += 1
+                received_bytes[0] += len(message)
+
+    tasks = [asyncio.create_task(client(i)) for i in range(clients)]
+    await asyncio.sleep(1.0)  # let everyone connect and take their snapshot
+    base, base_bytes = sum(counts), received_bytes[0]
+    started = time.perf_counter()
+    await asyncio.sleep(seconds)
+    elapsed = time.perf_counter() - started
+    frames, nbytes = sum(counts) - base, received_bytes[0] - base_bytes
+    stop.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return {
+        "clients": clients,
+        "connected": clients - sum(isinstance(r, Exception) for r in results),
+        "frames_per_s": frames / elapsed,
+        "frames_per_s_per_client": frames / elapsed / clients,
+        "bytes_per_s": nbytes / elapsed,
+        "hub_dropped": beam.hub.dropped,
+    }
+
+
+def bench_server(quick):
+    """Sample-to-browser detection latency and /ws fan-out throughput against a live server."""
+    source = start_synthetic_sampler(rate_hz=50)
+    results = {}
+    with ServerThread() as server:
+        latencies = asyncio.run(_detection_latency(server.port, source, 5 if quick else 20))
+        results["detection_latency_ms"] = summarize(latencies)
+        source.drop(False)
+        fanout = []
+        for clients in (1, 10, 100) if quick else (1, 10, 100, 1000):
+            fanout.append(asyncio.run(_fanout(server.port, clients, 3 if quick else 10)))
+        results["ws_fanout"] = fanout
+    return results
+
+
+def _link_batches(links, rate_hz, batch_s, start):
+    """One ingest message per link covering `batch_s` seconds of samples from `start`."""
+    n = int(rate_hz * batch_s)
+    return [
+        {"link": f"node-{i}", "samples": [[start + k / rate_hz, -45 - (k + i) % 3, -92] for k in range(n)]}
+        for i in range(links)
+    ]
+
+
+async def _ingest_ws(port, links, rate_hz, seconds):
+    """`links` agents each pushing 0.5 s batches over /ingest/ws at `rate_hz`, in real time."""
+    lag = []
+
+    async def agent(i):
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ingest/ws") as ws:
+            started = time.time()
+            for step in range(int(seconds / 0.5)):
+                due = started + (step + 1) * 0.5
+                await asyncio.sleep(max(0.0, due - time.time()))
+                batch = _link_batches(1, rate_hz, 0.5, due - 0.5)[0]
+                batch["link"] = f"ws-{i}"
+                sent = time.perf_counter()
+                await ws.send(json.dumps(batch))
+                await ws.recv()
+                lag.append((time.perf_counter() - sent) * 1e3)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(agent(i) for i in range(links)))
+    return {"links": links, "rate_hz": rate_hz, "wall_s": time.perf_counter() - started, "ack_ms": summarize(lag)}
+
+
+def bench_ingest(quick):
+    """Remote-link ingest: in-process cost per sample, and real-time WS agents against a live server."""
+    beam.link_registry = beam.LinkRegistry()
+    links, rate_hz, seconds = 500, 10, 10 if quick else 60
+    durations = []
+    for step in range(int(seconds / 0.5)):
+        message = _link_batches(links, rate_hz, 0.5, time.time() - 0.5)
+        started = time.perf_counter()
+        beam.link_registry.ingest(message)
+        durations.append(time.perf_counter() - started)
+    samples = links * rate_hz * 0.5
+    results = {
+        "in_process": {
+            "links": links,
+            "rate_hz": rate_hz,
+            "sample_us": summarize([d / samples * 1e6 for d in durations]),
+            "cpu_share_at_rate": sum(durations) / seconds,
+        }
+    }
+    beam.link_registry = beam.LinkRegistry()
+    with ServerThread() as server:
+        results["ws"] = [asyncio.run(_ingest_ws(server.port, n, rate_hz, 3 if quick else 10)) for n in (10, 100, 300)]
+    return results
+
+
+async def _ws_gaps(port, seconds):
+    """Inter-arrival times (ms) of hub frames on one /ws connection."""
+    gaps = []
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws") as ws:
+        await ws.recv()
+        last = time.perf_counter()
+        deadline = last + seconds
+        while time.perf_counter() < deadline:
+            await ws.recv()
+            now = time.perf_counter()
+            gaps.append((now - last) * 1e3)
+            last = now
+    return gaps
+
+
+def _feed_audio(stop, write, speed):
+    """Write synthetic audio blocks at `speed` x real time until stopped."""
+    samplerate, blocksize = beam.DOPPLER_SAMPLERATE, beam.AUDIO_BLOCKSIZE
+    audio = _synthetic_audio(samplerate, 10)
+    pos = 0
+    while not stop.is_set():
+        write(audio[pos:pos + blocksize])
+        pos = (pos + blocksize) % (audio.size - blocksize)
+        time.sleep(blocksize / samplerate / speed)
+
+
+def bench_dsp_isolation(quick):
+    """/ws frame jitter while the mic pipeline runs faster than real time, DSP in-thread vs in a worker process."""
+    if beam.load_numpy() is None:
+        return {"skipped": "numpy not available"}
+    samplerate, speed, seconds = beam.DOPPLER_SAMPLERATE, 8, 5 if quick else 20
+    if not isinstance(beam.rssi_source, SyntheticRssiSource):
+        start_synthetic_sampler(rate_hz=10)  # the hub only sends frames when something changed
+    results = {}
+    with ServerThread() as server:
+        results["idle"] = summarize(asyncio.run(_ws_gaps(server.port, seconds)))
+        for mode in ("thread", "process"):
+            stop = threading.Event()
+            threads = []
+            if mode == "thread":
+                beam.audio_ring = beam.AudioRing(int(beam.AUDIO_RING_SECONDS * samplerate), samplerate)
+                beam.doppler_engine = beam.make_doppler_engine()
+
+                def write(block):
+                    beam.audio_ring.write(block, time.time())
+                    beam.analyze_audio_block(beam.audio_ring.latest(len(block)), time.time())
+            else:
+                worker = beam.DspProcess(samplerate, capture=False)
+                worker.start()
+                time.sleep(2.0)  # let the child finish importing
+
+                def write(block):
+                    worker.ring.write(block, time.time())
+
+                def apply():
+                    while not stop.is_set():
+                        item = worker.get(timeout=0.5)
+                        if item is not None and item[0] == "frame":
+                            beam.apply_audio_features(*item[1:6])
+
+                threads.append(threading.Thread(target=apply))
+            threads.append(threading.Thread(target=_feed_audio, args=(stop, write, speed)))
+            for thread in threads:
+                thread.start()
+            results[mode] = summarize(asyncio.run(_ws_gaps(server.port, seconds)))
+            stop.set()
+            for thread in threads:
+                thread.join()
+            if mode == "process":
+                results[mode]["worker_dropped_frames"] = worker.dropped
+                worker.close()
+    results["audio_speed"] = speed
+    return results
+
+
+BENCHMARKS = {
+    "payload": bench_payload,
+    "dsp": bench_dsp,
+    "server": bench_server,
+    "ingest": bench_ingest,
+    "dsp_isolation": bench_dsp_isolation,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "-C", HERE, "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and shorter runs")
+    parser.add_argument("--only", help="comma-separated subset of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "quick": args.quick,
+        },
+        "results": {},
+    }
+    for name in names:
+        print(f"running {name}...", file=sys.stderr)
+        with contextlib.redirect_stdout(sys.stderr):  # keep beam's INFO lines out of the JSON
+            report["results"][name] = BENCHMARKS[name](args.quick)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(os.path.join(INVOKED_FROM, args.out), "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
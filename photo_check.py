@@ -0,0 +1,66 @@
+"""
+Photo store migration check: captures from before the managed store must be indexed and renamed.
+
+    python photo_check.py
+
+Builds a scratch photo directory holding a baseline-era `capture_<stamp>.jpg`, a millisecond-stamped
+capture without a hash and an already hashed one, then loads a `PhotoStore` over it. Checks that
+every capture is renamed to `capture_<stamp>-<hash>.<ext>`, indexed in time order, served by
+`path()`, and dropped by age retention. Exits non-zero on any violation.
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import beam
+
+
+def write_capture(root: Path, name: str, payload: bytes):
+    (root / name).write_bytes(payload)
+
+
+def main():
+    violations = []
+    now = time.time()
+    old = time.strftime("%Y%m%d_%H%M%S", time.localtime(now - 3 * 86400))
+    recent = time.strftime("%Y%m%d_%H%M%S", time.localtime(now - 60))
+    with tempfile.TemporaryDirectory(prefix="beam-photos-") as workdir:
+        root = Path(workdir)
+        write_capture(root, f"capture_{old}.jpg", b"baseline era")
+        write_capture(root, f"capture_{recent}_250.jpg", b"before hashing")
+        hashed = f"capture_{recent}_500-{'0' * 16}.jpg"
+        write_capture(root, hashed, b"already hashed")
+
+        store = beam.PhotoStore(root, max_bytes=1 << 30, max_age=0)
+        store.load()
+        names = [record.name for record in store.query(limit=10)][::-1]
+        if len(names) != 3:
+            violations.append(f"indexed {len(names)} of 3 captures: {names}")
+        for name in names:
+            if not beam.PhotoStore.NAME_RE.fullmatch(name) or "-" not in name:
+                violations.append(f"{name} was not given a hashed name")
+            if store.path(name) is None:
+                violations.append(f"path() does not serve {name}")
+        if names and not names[0].startswith(f"capture_{old}-"):
+            violations.append(f"oldest capture is {names[0]}, expected the baseline-era one")
+        leftover = sorted(p.name for p in root.iterdir() if p.is_file() and "-" not in p.name)
+        if leftover:
+            violations.append(f"unrenamed files left on disk: {leftover}")
+
+        store.max_age = 86400
+        store.prune(now)
+        remaining = [record.name for record in store.query(limit=10)]
+        if any(name.startswith(f"capture_{old}") for name in remaining) or len(remaining) != 2:
+            violations.append(f"age retention left {remaining}")
+        if any(p.name.startswith(f"capture_{old}") for p in root.iterdir()):
+            violations.append("age retention did not delete the baseline-era file")
+
+    print(json.dumps({"captures": names, "after_prune": remaining, "violations": violations}, indent=2))
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Start-up budget check: launches `uvicorn beam:app` and fails if it takes too long to serve.
+
+    python startup_check.py                  # 3 runs, 2 s budget
+    python startup_check.py --budget 1.5 --runs 5
+
+Each run starts a fresh server in a scratch directory (fake camera, file RSSI source) and
+measures the time from launch to the first `/health` response, and until every background
+start-up task has finished. It also checks that importing beam loads none of the deferred
+dependencies (numpy, sounddevice, PIL). Exits non-zero if the median time to serve is over
+budget or a deferred module was imported eagerly.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DEFERRED = ("numpy", "sounddevice", "PIL")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_health(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+        return json.load(resp)
+
+
+def scratch_env(workdir):
+    rssi_file = Path(workdir) / "rssi.txt"
+    rssi_file.write_text("-45 -90\n-46 -90\n-44 -91\n")
+    env = dict(os.environ, CAMERA="fake", RSSI_SOURCE=f"file:{rssi_file}", PYTHONPATH=str(HERE))
+    env.pop("TRACE_REPLAY", None)
+    return env
+
+
+def eager_imports(workdir):
+    """Deferred modules that `import beam` pulls in anyway."""
+    code = f"import sys, json, beam; print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=scratch_env(workdir),
+                         capture_output=True, text=True, timeout=60, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(timeout=30.0):
+    with tempfile.TemporaryDirectory(prefix="beam-startup-") as workdir:
+        port = free_port()
+        started = time.monotonic()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "beam:app", "--port", str(port), "--log-level", "warning"],
+            cwd=workdir, env=scratch_env(workdir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            serving = ready = None
+            health = {}
+            while time.monotonic() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"server exited with {server.returncode}")
+                try:
+                    health = get_health(port)
+                except OSError:
+                    time.sleep(0.01)
+                    continue
+                if serving is None:
+                    serving = time.monotonic() - started
+                if health.get("ready"):
+                    ready = time.monotonic() - started
+                    break
+                time.sleep(0.05)
+            return {"serving_s": serving, "ready_s": ready, "tasks": health.get("tasks")}
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=float, default=2.0, help="max median seconds from launch to first response")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="beam-startup-") as workdir:
+        eager = eager_imports(workdir)
+    runs = [measure() for _ in range(args.runs)]
+    times = [run["serving_s"] for run in runs if run["serving_s"] is not None]
+    median = statistics.median(times) if len(times) == len(runs) else None
+    violations = []
+    if eager:
+        violations.append(f"import beam loaded deferred modules: {', '.join(eager)}")
+    if median is None:
+        violations.append("server never answered /health")
+    elif median > args.budget:
+        violations.append(f"median time to serve {median:.2f} s is over the {args.budget:g} s budget")
+    report = {
+        "budget_s": args.budget,
+        "median_serving_s": median,
+        "runs": runs,
+        "eager_imports": eager,
+        "violations": violations,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Concurrency stress test for beam.py: samplers at full rate while clients hammer every endpoint.
+
+    python stress.py                 # 20 s, exits non-zero on any violation
+    python stress.py --seconds 60 --clients 16
+
+Checks that no request fails with a 5xx, that no sampler iteration raises,
+that every payload is internally consistent (the reported threshold is the
+one configured for the reported mode) and that each client sees
+`state_version` only move forward.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+
+import httpx
+
+from bench import ServerThread, beam, start_synthetic_sampler, websockets
+
+# One threshold per mode; the mode switcher only ever pairs each mode with its own value
+MODE_THRESHOLDS = {"air": 5, "wall": 11, "cusum": 7}
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.violations = []
+
+    def ok(self):
+        with self.lock:
+            self.requests += 1
+
+    def fail(self, message):
+        with self.lock:
+            self.requests += 1
+            if len(self.violations) < 50:
+                self.violations.append(message)
+
+
+def check_payload(payload, last_version, where, results):
+    mode = payload.get("mode")
+    if payload.get("threshold") != MODE_THRESHOLDS.get(mode):
+        results.fail(f"{where}: mode {mode} reported with threshold {payload.get('threshold')}")
+    version = payload.get("state_version")
+    if version is None or version < last_version:
+        results.fail(f"{where}: state_version went from {last_version} to {version}")
+        return last_version
+    return version
+
+
+def audio_feeder(stop, results):
+    """Push synthetic audio through the mic pipeline as fast as a real device would, and then some."""
+    np = beam.load_numpy()
+    samplerate = beam.DOPPLER_SAMPLERATE
+    blocksize = beam.AUDIO_BLOCKSIZE
+    beam.audio_ring = beam.AudioRing(int(beam.AUDIO_RING_SECONDS * samplerate), samplerate)
+    rng = np.random.default_rng(0)
+    t = np.arange(blocksize) / samplerate
+    tone = (0.05 * np.sin(2 * np.pi * beam.DOPPLER_CARRIER_HZ * t)).astype(np.float32)
+    while not stop.is_set():
+        block = tone + 0.01 * rng.standard_normal(blocksize).astype(np.float32)
+        try:
+            beam.audio_ring.write(block, time.time())
+            beam.analyze_audio_block(beam.audio_ring.latest(blocksize), time.time())
+        except Exception as exc:
+            results.fail(f"audio pipeline raised: {exc!r}")
+        time.sleep(blocksize / samplerate / 4)
+
+
+def http_reader(base, stop, results):
+    paths = ["/metrics", "/metrics?cursor={cursor}&epoch={epoch}", "/history?series=rssi", "/links",
+             "/internal/metrics", "/photo", "/metrics?format=binary"]
+    last_version = 0
+    cursor, epoch = 0, ""
+    with httpx.Client(base_url=base, timeout=10) as client:
+        while not stop.is_set():
+            path = random.choice(paths).format(cursor=cursor, epoch=epoch)
+            try:
+                resp = client.get(path)
+            except Exception as exc:
+                results.fail(f"GET {path}: {exc!r}")
+                continue
+            if resp.status_code >= 500:
+                results.fail(f"GET {path}: HTTP {resp.status_code}")
+                continue
+            if path.startswith("/metrics") and "format=binary" not in path:
+                payload = resp.json()
+                last_version = check_payload(payload, last_version, f"GET {path}", results)
+                cursor, epoch = payload.get("seq", cursor), payload.get("epoch", epoch)
+            results.ok()
+
+
+def _call(client, method, path, results, **kwargs):
+    try:
+        resp = client.request(method, path, **kwargs)
+    except Exception as exc:
+        results.fail(f"{method} {path}: {exc!r}")
+        return
+    if resp.status_code >= 500:
+        results.fail(f"{method} {path}: HTTP {resp.status_code}")
+    else:
+        results.ok()
+
+
+def mode_switcher(base, stop, results):
+    """The only writer of mode/threshold, so each mode keeps its own threshold throughout."""
+    with httpx.Client(base_url=base, timeout=10) as client:
+        while not stop.is_set():
+            mode = random.choice(list(MODE_THRESHOLDS))
+            _call(client, "POST", f"/mode?new_mode={mode}", results)
+            _call(client, "POST", f"/threshold?value={MODE_THRESHOLDS[mode]}", results)
+
+
+def controller(base, stop, results):
+    """Recalibrate, retune the detector and push remote-link samples."""
+    with httpx.Client(base_url=base, timeout=10) as client:
+        while not stop.is_set():
+            _call(client, "POST", "/calibrate", results)
+            _call(client, "POST", f"/detector?min_dwell={random.choice([0, 0.1])}", results)
+            batch = [{"link": f"stress-{i}", "samples": [[time.time(), -45 + random.random(), -90]]} for i in range(20)]
+            _call(client, "POST", "/ingest", results, json=batch)
+
+
+async def ws_readers(port, count, stop, results):
+    async def reader(i):
+        last_version = 0
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws", max_queue=None) as ws:
+            while not stop.is_set():
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                last_version = check_payload(json.loads(message), last_version, f"ws#{i}", results)
+                results.ok()
+
+    outcomes = await asyncio.gather(*(reader(i) for i in range(count)), return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            results.fail(f"ws reader: {outcome!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--clients", type=int, default=8, help="HTTP reader threads")
+    parser.add_argument("--ws", type=int, default=4, help="WebSocket readers")
+    parser.add_argument("--rate", type=float, default=50, help="RSSI samples per second")
+    args = parser.parse_args()
+
+    results = Results()
+    stop = threading.Event()
+    for mode, value in MODE_THRESHOLDS.items():
+        beam.set_mode(mode)
+        beam.set_threshold(value)
+    beam.set_mode("air")
+    start_synthetic_sampler(rate_hz=args.rate)
+    errors_before = beam.events_total._values.get("rssi_error", 0)
+
+    with ServerThread() as server:
+        base = f"http://127.0.0.1:{server.port}"
+        workers = [threading.Thread(target=http_reader, args=(base, stop, results)) for _ in range(args.clients)]
+        workers += [threading.Thread(target=mode_switcher, args=(base, stop, results))]
+        workers += [threading.Thread(target=controller, args=(base, stop, results)) for _ in range(2)]
+        if beam.load_numpy() is not None:
+            workers.append(threading.Thread(target=audio_feeder, args=(stop, results)))
+        workers.append(threading.Thread(target=lambda: asyncio.run(ws_readers(server.port, args.ws, stop, results))))
+        for worker in workers:
+            worker.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for worker in workers:
+            worker.join(timeout=10)
+
+    sampler_errors = beam.events_total._values.get("rssi_error", 0) - errors_before
+    if sampler_errors:
+        results.violations.append(f"RSSI sampler raised {sampler_errors} times")
+    report = {
+        "seconds": args.seconds,
+        "requests": results.requests,
+        "requests_per_s": results.requests / args.seconds,
+        "state_version": beam.sensor_state.get().version,
+        "violations": results.violations,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if results.violations else 0)
+
+
+if __name__ == "__main__":
+    main()